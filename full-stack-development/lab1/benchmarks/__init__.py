@@ -0,0 +1,9 @@
+"""
+Бенчмарки Filmoteka API
+
+Запускаются из папки lab1 как модули, например:
+    python -m benchmarks.bench_concurrency
+
+Общий нагрузочный прогон с JSON-результатом и сравнением с базовым -
+python -m benchmarks.suite.
+"""
@@ -0,0 +1,79 @@
+"""
+Бенчмарк сжатия ответов: байты на проводе и время CPU на запрос
+
+Для типичных тел ответов (страницы GET /films разного размера, с описаниями
+и с проекцией fields=id,title,year,rating) сжимает тело gzip и brotli
+(если установлен пакет brotli) на разных уровнях и печатает размер
+и медианное время сжатия одного ответа.
+
+Запуск из папки lab1:
+    python -m benchmarks.bench_compression --repeats 200
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from benchmarks.common import percentile, synthetic_film
+from compression import available_encodings, compress
+from serialization import FILM_FIELDS, film_list_response
+
+# Строка колонок, как из запроса SQLAlchemy (с доступом к полям по имени)
+FilmRow = namedtuple("FilmRow", FILM_FIELDS)
+
+GZIP_LEVELS = [1, 5, 6, 9]
+BROTLI_QUALITIES = [1, 4, 11]
+
+
+def _payloads() -> dict[str, bytes]:
+    rng = random.Random(0)
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    films = [
+        {**synthetic_film(rng), "id": i + 1, "created_at": created + timedelta(seconds=i), "updated_at": None}
+        for i in range(100)
+    ]
+    rows = [FilmRow(**{name: film[name] for name in FILM_FIELDS}) for film in films]
+
+    def page(size: int, fields=None) -> bytes:
+        return film_list_response(rows[:size], fields=fields, total=100_000, page=1, size=size, pages=1000).body
+
+    return {
+        "films?size=10": page(10),
+        "films?size=100": page(100),
+        "films?size=100&fields=...": page(100, ("title", "year", "rating", "id")),
+    }
+
+
+def _measure(body: bytes, encoding: str, level: int, repeats: int) -> tuple[int, float]:
+    """Размер сжатого тела и медианное время сжатия (мс)"""
+    size = len(compress(body, encoding, level, level))
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        compress(body, encoding, level, level)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return size, percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=200, help="Число повторов для каждого варианта")
+    args = parser.parse_args()
+
+    variants = [("gzip", level) for level in GZIP_LEVELS]
+    if "br" in available_encodings():
+        variants += [("br", quality) for quality in BROTLI_QUALITIES]
+    else:
+        print("Пакет brotli не установлен - сравнивается только gzip")
+
+    print(f"{'ответ':<28}{'сжатие':<9}{'байт':>9}{'доля':>7}{'мс CPU':>9}")
+    for name, body in _payloads().items():
+        print(f"{name:<28}{'нет':<9}{len(body):>9}{1:>7.2f}{0:>9.3f}")
+        for encoding, level in variants:
+            size, latency = _measure(body, encoding, level, args.repeats)
+            print(f"{'':<28}{f'{encoding}-{level}':<9}{size:>9}{size / len(body):>7.2f}{latency:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
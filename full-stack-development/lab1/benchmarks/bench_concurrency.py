@@ -0,0 +1,100 @@
+"""
+Бенчмарк конкурентности: латентность GET /films/{id} во время тяжелых сканов /films
+
+Для каждого режима db_execution_mode (inline и threadpool) параллельно
+с потоком быстрых запросов карточки фильма запускаются "тяжелые" запросы
+списка (фильтр по подстроке жанра + сортировка по названию), и считаются
+p50/p95/p99 латентности быстрых запросов. Кэши приложения отключены:
+иначе тяжелые запросы отдавались бы из list_cache, не доходя до БД.
+
+Запуск из папки lab1 (нужен httpx):
+    python -m benchmarks.bench_concurrency --films 200000 --requests 300
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.common import make_temp_db, remove_temp_db, seed_films, percentile
+from cache import count_cache, film_cache, list_cache
+from config import settings
+from database import get_db, get_read_db
+from main import app
+
+HEAVY_URL = "/films?genre=ма&sort_by=title&sort_order=desc&size=100"
+
+
+async def _heavy_loop(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    """Крутить тяжелые запросы списка, пока не выставлен stop"""
+    done = 0
+    while not stop.is_set():
+        response = await client.get(HEAVY_URL)
+        response.raise_for_status()
+        done += 1
+    return done
+
+
+async def _measure(mode: str, films: int, requests: int, heavy_workers: int) -> dict:
+    settings.db_execution_mode = mode
+    rng = random.Random(1)
+    latencies = []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        heavy = [asyncio.create_task(_heavy_loop(client, stop)) for _ in range(heavy_workers)]
+        await asyncio.sleep(0.05)
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(f"/films/{rng.randint(1, films)}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+        stop.set()
+        heavy_done = sum(await asyncio.gather(*heavy))
+    return {
+        "mode": mode,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "heavy_requests": heavy_done,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--films", type=int, default=200_000, help="Размер синтетического каталога")
+    parser.add_argument("--requests", type=int, default=300, help="Число замеряемых GET /films/{id}")
+    parser.add_argument("--heavy", type=int, default=2, help="Число параллельных тяжелых сканов")
+    args = parser.parse_args()
+
+    # Измеряется выполнение запросов к БД, а не попадания в кэш
+    for cache in (count_cache, list_cache, film_cache):
+        cache.maxsize = 0
+
+    engine, session_factory, path = make_temp_db()
+    try:
+        print(f"Заполнение каталога: {args.films} фильмов...")
+        seed_films(engine, args.films)
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_db
+        print(f"{'режим':<12}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'сканов':>10}")
+        for mode in ("inline", "threadpool"):
+            result = asyncio.run(_measure(mode, args.films, args.requests, args.heavy))
+            print(f"{result['mode']:<12}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                  f"{result['p99_ms']:>10.1f}{result['heavy_requests']:>10}")
+    finally:
+        app.dependency_overrides.clear()
+        remove_temp_db(engine, path)
+
+
+if __name__ == "__main__":
+    main()
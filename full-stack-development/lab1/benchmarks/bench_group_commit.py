@@ -0,0 +1,99 @@
+"""
+Бенчмарк группового коммита POST /films
+
+--concurrency клиентов одновременно создают фильмы (всего --requests)
+через main.app в том же процессе (httpx.ASGITransport). Сравниваются
+коммит на каждый запрос и групповой коммит (group_commit.py) с разными
+max_delay_ms и PRAGMA synchronous; печатаются созданий в секунду, p50/p95
+латентности и средний размер пачки. БД создается заново для каждого варианта.
+
+Запуск из папки lab1 (нужен httpx):
+    python -m benchmarks.bench_group_commit --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+import group_commit
+import main as api
+from benchmarks.common import make_temp_db, percentile, remove_temp_db, synthetic_film
+from database import get_db
+
+# (название, max_delay_ms или None - без группировки, synchronous)
+VARIANTS = [
+    ("по одному", None, None),
+    ("группа 1 мс", 1.0, "NORMAL"),
+    ("группа 5 мс", 5.0, "NORMAL"),
+    ("группа 5 мс FULL", 5.0, "FULL"),
+]
+
+
+class _CountingCommitter(group_commit.GroupCommitter):
+    """GroupCommitter, считающий пачки"""
+
+    batches = 0
+
+    async def _commit(self, batch):
+        self.batches += 1
+        await super()._commit(batch)
+
+
+async def _run(requests: int, concurrency: int) -> tuple[list[float], float]:
+    rng = random.Random(0)
+    films = [synthetic_film(rng) for _ in range(requests)]
+    latencies = []
+
+    async def client(http: httpx.AsyncClient) -> None:
+        while films:
+            film = films.pop()
+            started = time.perf_counter()
+            response = await http.post("/films", json=film)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Число созданий на вариант")
+    parser.add_argument("--concurrency", type=int, default=32, help="Параллельных клиентов")
+    parser.add_argument("--max-size", type=int, default=64, help="Наибольший размер пачки")
+    args = parser.parse_args()
+
+    print(f"{'вариант':<18}{'созданий/с':>12}{'p50, мс':>9}{'p95, мс':>9}{'пачка':>7}")
+    for name, max_delay_ms, synchronous in VARIANTS:
+        engine, session_factory, path = make_temp_db()
+        try:
+            def override_get_db():
+                db = session_factory()
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            api.app.dependency_overrides[get_db] = override_get_db
+            committer = None
+            if max_delay_ms is not None:
+                committer = _CountingCommitter(args.max_size, max_delay_ms / 1000, synchronous, session_factory)
+            api.group_committer = committer
+            latencies, elapsed = asyncio.run(_run(args.requests, args.concurrency))
+            batch = len(latencies) / committer.batches if committer else 1.0
+            print(f"{name:<18}{len(latencies) / elapsed:>12.1f}{percentile(latencies, 50):>9.1f}"
+                  f"{percentile(latencies, 95):>9.1f}{batch:>7.1f}")
+        finally:
+            api.group_committer = None
+            api.app.dependency_overrides.clear()
+            remove_temp_db(engine, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Бенчмарк смешанной нагрузки: пропускная способность чтения и записи SQLite
+
+Для каждого профиля настроек SQLite (default - журнал отката и synchronous=FULL,
+performance - WAL и прагмы из config.py) на отдельной временной БД в течение
+--duration секунд параллельно работают потоки чтения (карточка фильма и
+страница списка с total) и потоки записи (create_film). Кэши отключены,
+чтобы измерять саму БД.
+
+Запуск из папки lab1:
+    python -m benchmarks.bench_mixed --films 100000 --readers 8 --writers 2 --duration 10
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import make_temp_db, remove_temp_db, seed_films, percentile, synthetic_film
+from cache import count_cache, film_cache, list_cache
+from crud import create_film, get_film, get_films
+from schemas import FilmCreate
+
+
+def _reader(session_factory, films: int, seed: int, stop: threading.Event, out: dict) -> None:
+    rng = random.Random(seed)
+    with session_factory() as db:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                if rng.random() < 0.5:
+                    get_film(db, rng.randint(1, films))
+                else:
+                    get_films(db, skip=rng.randint(0, 50) * 20, limit=20,
+                              genre=rng.choice(["ма", "дра", None]), sort_by="rating", sort_order="desc")
+                db.rollback()
+            except OperationalError:
+                db.rollback()
+                out["errors"] += 1
+                continue
+            out["latencies"].append((time.perf_counter() - started) * 1000)
+
+
+def _writer(session_factory, seed: int, stop: threading.Event, out: dict) -> None:
+    rng = random.Random(seed)
+    with session_factory() as db:
+        while not stop.is_set():
+            film = FilmCreate(**synthetic_film(rng))
+            started = time.perf_counter()
+            try:
+                create_film(db, film)
+            except OperationalError:
+                db.rollback()
+                out["errors"] += 1
+                continue
+            out["latencies"].append((time.perf_counter() - started) * 1000)
+
+
+def _run(profile: str, films: int, readers: int, writers: int, duration: float) -> dict:
+    engine, session_factory, path = make_temp_db(profile=profile)
+    try:
+        seed_films(engine, films)
+        with engine.connect() as conn:
+            journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        reads = [{"latencies": [], "errors": 0} for _ in range(readers)]
+        writes = [{"latencies": [], "errors": 0} for _ in range(writers)]
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=_reader, args=(session_factory, films, i, stop, reads[i]))
+            for i in range(readers)
+        ] + [
+            threading.Thread(target=_writer, args=(session_factory, 1000 + i, stop, writes[i]))
+            for i in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        remove_temp_db(engine, path)
+
+    read_latencies = [value for out in reads for value in out["latencies"]]
+    write_latencies = [value for out in writes for value in out["latencies"]]
+    return {
+        "profile": profile,
+        "journal_mode": journal_mode,
+        "reads_per_s": len(read_latencies) / duration,
+        "writes_per_s": len(write_latencies) / duration,
+        "read_p95_ms": percentile(read_latencies, 95),
+        "write_p95_ms": percentile(write_latencies, 95),
+        "errors": sum(out["errors"] for out in reads + writes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--films", type=int, default=100_000, help="Размер синтетического каталога")
+    parser.add_argument("--readers", type=int, default=8, help="Число потоков чтения")
+    parser.add_argument("--writers", type=int, default=2, help="Число потоков записи")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность замера для профиля, секунд")
+    parser.add_argument("--profiles", nargs="+", default=["default", "performance"],
+                        choices=["default", "performance"], help="Сравниваемые профили SQLite")
+    args = parser.parse_args()
+
+    for cache in (count_cache, list_cache, film_cache):
+        cache.maxsize = 0
+
+    print(f"{'профиль':<13}{'журнал':<10}{'чтений/с':>10}{'записей/с':>11}"
+          f"{'p95 чт, мс':>12}{'p95 зап, мс':>13}{'ошибок':>8}")
+    for profile in args.profiles:
+        result = _run(profile, args.films, args.readers, args.writers, args.duration)
+        print(f"{result['profile']:<13}{result['journal_mode']:<10}{result['reads_per_s']:>10.0f}"
+              f"{result['writes_per_s']:>11.1f}{result['read_p95_ms']:>12.1f}"
+              f"{result['write_p95_ms']:>13.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Бенчмарк поиска: FTS5-индекс против прежнего ILIKE '%q%' по названию
+
+Запуск из папки lab1:
+    python -m benchmarks.bench_search --films 1000000
+"""
+import argparse
+import time
+
+from benchmarks.common import make_temp_db, remove_temp_db, seed_films, percentile
+from cache import count_cache
+from crud import search_films_by_title
+from models import Film
+
+# Частые и редкие слова синтетического словаря (см. benchmarks.common.VOCABULARY)
+QUERIES = ["мат", "матрица", "тем рыц", "нол", "побег", "сталкер солярис", "ночь", "небо", "баве", "кола", "сароту"]
+
+
+def _ilike_search(db, title_query: str, limit: int = 10):
+    """Прежняя реализация поиска (подстрока в названии + COUNT)"""
+    query = db.query(Film).filter(Film.title.ilike(f"%{title_query}%"))
+    total = query.count()
+    return query.offset(0).limit(limit).all(), total
+
+
+def _fts_search(db, title_query: str, limit: int = 10):
+    return search_films_by_title(db, title_query, limit=limit)
+
+
+def _measure(db, search, title_query: str, repeats: int) -> tuple[float, int]:
+    """Медианное время запроса (мс) и число найденных фильмов"""
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        _, total = search(db, title_query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--films", type=int, default=1_000_000, help="Размер синтетического каталога")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов каждого запроса")
+    args = parser.parse_args()
+
+    # Кэш total отключен, чтобы мерить сами запросы
+    count_cache.maxsize = 0
+    engine, session_factory, path = make_temp_db()
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        seed_films(engine, args.films)
+        print(f"Каталог {args.films} фильмов заполнен (с индексацией) за {time.perf_counter() - started:.1f} с")
+        print(f"{'запрос':<18}{'ilike, мс':>11}{'найдено':>10}{'fts5, мс':>11}{'найдено':>10}")
+        ilike_all, fts_all = [], []
+        for title_query in QUERIES:
+            ilike_ms, ilike_total = _measure(db, _ilike_search, title_query, args.repeats)
+            fts_ms, fts_total = _measure(db, _fts_search, title_query, args.repeats)
+            ilike_all.append(ilike_ms)
+            fts_all.append(fts_ms)
+            print(f"{title_query:<18}{ilike_ms:>11.1f}{ilike_total:>10}{fts_ms:>11.1f}{fts_total:>10}")
+        print(f"{'медиана':<18}{percentile(ilike_all, 50):>11.1f}{'':>10}{percentile(fts_all, 50):>11.1f}")
+        print("ilike ищет подстроку только в названии (и регистрозависим для кириллицы),"
+              " fts5 - слова-префиксы в названии, режиссере и описании")
+    finally:
+        db.close()
+        remove_temp_db(engine, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Микробенчмарк сериализации страницы GET /films (без БД)
+
+Сравнивает время превращения одной страницы фильмов в тело ответа:
+    pydantic     - прежний путь: FilmListResponse из ORM-объектов Film,
+                   проверка по response_model и jsonable_encoder (как в FastAPI)
+    rows+json    - кортежи колонок, film_list_response со стандартным json
+    rows+orjson  - кортежи колонок, film_list_response с orjson (текущий путь)
+
+Запуск из папки lab1:
+    python -m benchmarks.bench_serialization --size 100 --repeats 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import serialization
+from benchmarks.common import percentile, synthetic_film
+from main import app
+from models import Film
+from schemas import FilmListResponse
+from serialization import FILM_FIELDS, film_list_response
+
+
+def _make_page(size: int) -> list[dict]:
+    rng = random.Random(0)
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        {**synthetic_film(rng), "id": i + 1, "created_at": created + timedelta(seconds=i), "updated_at": None}
+        for i in range(size)
+    ]
+
+
+def _films_field():
+    """response_model маршрута GET /films"""
+    for route in app.routes:
+        if getattr(route, "path", None) == "/films" and "GET" in route.methods:
+            return route.response_field
+    raise RuntimeError("Маршрут GET /films не найден")
+
+
+def _measure(render, repeats: int) -> tuple[float, float, int]:
+    """Медиана и p95 времени (мкс) и размер тела (байт)"""
+    size = len(render())
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        render()
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+    return percentile(latencies, 50), percentile(latencies, 95), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100, help="Фильмов на странице")
+    parser.add_argument("--repeats", type=int, default=2000, help="Число повторов для каждого способа")
+    args = parser.parse_args()
+
+    page = _make_page(args.size)
+    films = [Film(**film) for film in page]
+    rows = [tuple(film[name] for name in FILM_FIELDS) for film in page]
+    meta = {"total": 100_000, "page": 1, "size": args.size, "pages": 100_000 // args.size}
+    field = _films_field()
+    loop = asyncio.new_event_loop()
+
+    def render_pydantic() -> bytes:
+        model = FilmListResponse(items=films, **meta)
+        content = loop.run_until_complete(serialize_response(field=field, response_content=model))
+        return JSONResponse(content).body
+
+    def render_rows() -> bytes:
+        return film_list_response(rows, **meta).body
+
+    orjson = serialization.orjson
+    results = [("pydantic", _measure(render_pydantic, args.repeats))]
+    serialization.orjson = None
+    try:
+        results.append(("rows+json", _measure(render_rows, args.repeats)))
+    finally:
+        serialization.orjson = orjson
+    if orjson is not None:
+        results.append(("rows+orjson", _measure(render_rows, args.repeats)))
+    loop.close()
+
+    baseline = results[0][1][0]
+    print(f"Страница из {args.size} фильмов, {args.repeats} повторов")
+    print(f"{'способ':<14}{'медиана, мкс':>14}{'p95, мкс':>11}{'байт':>9}{'ускорение':>11}")
+    for name, (median, p95, size) in results:
+        print(f"{name:<14}{median:>14.0f}{p95:>11.0f}{size:>9}{baseline / median:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Бенчмарк масштабирования по процессам: python manage.py serve --workers N
+
+Для каждого числа воркеров (--workers) сервер запускается отдельным
+процессом на временной БД с синтетическим каталогом и нагружается
+по сети несколькими процессами-клиентами (--clients, в каждом
+--concurrency параллельных запросов) в течение --duration секунд смесью
+чтений списка и карточек. Печатаются RPS, p50/p95 и ускорение относительно
+первой строки, а также время распространения записи: после PUT карточка
+и первая страница списка читаются через новые соединения (они попадают
+к разным воркерам), пока все ответы не покажут изменение.
+
+Ускорение ограничено числом ядер машины (печатается в начале) и тем, что
+клиенты работают на той же машине.
+
+Запуск из папки lab1 (нужен httpx):
+    python -m benchmarks.bench_workers --workers 1 2 4 --films 10000 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import make_temp_db, percentile, remove_temp_db, seed_films
+
+
+def _request(rng: random.Random, films: int) -> tuple[str, dict]:
+    if rng.random() < 0.5:
+        return f"/films/{rng.randint(1, films)}", {}
+    return "/films", {"page": rng.randint(1, 50), "size": 20, "sort_by": rng.choice(["year", "rating", "title"])}
+
+
+async def _load(base_url: str, films: int, duration: float, concurrency: int, seed: int) -> list[float]:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def client(rng: random.Random) -> None:
+        while time.perf_counter() < deadline:
+            url, params = _request(rng, films)
+            started = time.perf_counter()
+            response = await http.get(url, params=params)
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        await asyncio.gather(*(client(random.Random(seed + i)) for i in range(concurrency)))
+    return latencies
+
+
+def _load_process(args: tuple) -> list[float]:
+    return asyncio.run(_load(*args))
+
+
+def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {server.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+def _propagation(base_url: str, film_id: int, title: str, checks: int = 10, timeout: float = 10.0) -> float:
+    """
+    Время от ответа на PUT до первой проверки, начиная с которой checks
+    проверок подряд (новые соединения) видят изменение, мс
+    """
+    page_params = {"sort_by": "title", "sort_order": "desc", "size": 1}
+    # Карточка и страница попадают в кэши всех воркеров
+    for _ in range(checks * 2):
+        httpx.get(f"{base_url}/films/{film_id}")
+        httpx.get(f"{base_url}/films", params=page_params)
+    httpx.put(f"{base_url}/films/{film_id}", json={"title": title}).raise_for_status()
+    started = time.perf_counter()
+    fresh, fresh_since = 0, started
+    while fresh < checks:
+        checked_at = time.perf_counter()
+        if checked_at - started > timeout:
+            return float("inf")
+        card = httpx.get(f"{base_url}/films/{film_id}").json()
+        # Название сортируется последним: фильм должен оказаться первым в обратном порядке
+        page = httpx.get(f"{base_url}/films", params=page_params).json()
+        if card["title"] == title and page["items"][0]["id"] == film_id:
+            fresh, fresh_since = fresh + 1, fresh_since if fresh else checked_at
+        else:
+            fresh = 0
+    return (fresh_since - started) * 1000
+
+
+def run(workers: int, path: str, films: int, port: int, clients: int, concurrency: int, duration: float) -> dict:
+    """Запустить сервер с workers процессами и измерить его"""
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "FILMOTEKA_DATABASE_URL": f"sqlite:///{path}"}
+    server = subprocess.Popen(
+        [sys.executable, "manage.py", "serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(base_url, server)
+        jobs = [(base_url, films, duration, concurrency, i * 1000) for i in range(clients)]
+        started = time.perf_counter()
+        with multiprocessing.Pool(clients) as pool:
+            latencies = [value for part in pool.map(_load_process, jobs) for value in part]
+        elapsed = time.perf_counter() - started
+        propagation = _propagation(base_url, random.Random(workers).randint(1, films), f"яяя {workers}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        "workers": workers,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "propagation_ms": propagation,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Числа воркеров")
+    parser.add_argument("--films", type=int, default=10_000, help="Размер каталога")
+    parser.add_argument("--clients", type=int, default=2, help="Процессов-клиентов")
+    parser.add_argument("--concurrency", type=int, default=16, help="Параллельных запросов в клиенте")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность нагрузки, секунды")
+    parser.add_argument("--port", type=int, default=8765, help="Порт сервера")
+    args = parser.parse_args()
+
+    engine, _, path = make_temp_db()
+    try:
+        print(f"Заполнение каталога: {args.films} фильмов...", file=sys.stderr)
+        seed_films(engine, args.films)
+        engine.dispose()
+        print(f"Ядер: {os.cpu_count()}")
+        print(f"{'воркеров':>9}{'RPS':>9}{'ускорение':>11}{'p50, мс':>9}{'p95, мс':>9}{'запись видна, мс':>18}")
+        base_rps = None
+        for workers in args.workers:
+            result = run(workers, path, args.films, args.port, args.clients, args.concurrency, args.duration)
+            base_rps = base_rps or result["rps"]
+            print(f"{workers:>9}{result['rps']:>9.1f}{result['rps'] / base_rps:>11.2f}{result['p50_ms']:>9.1f}"
+                  f"{result['p95_ms']:>9.1f}{result['propagation_ms']:>18.0f}")
+    finally:
+        remove_temp_db(engine, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Общие утилиты бенчмарков: временная БД, синтетический каталог, перцентили
+"""
+import itertools
+import math
+import os
+import random
+import tempfile
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import create_db_engine, init_db
+from dimensions import rebuild_dimensions
+from models import Film
+from stats import rebuild_stats
+
+GENRES = ["Драма", "Комедия", "Фантастика", "Криминал", "Триллер", "Боевик", "Мелодрама", "Ужасы"]
+DIRECTORS = ["Кристофер Нолан", "Фрэнк Дарабонт", "Квентин Тарантино", "Андрей Тарковский", "Никита Михалков"]
+WORDS = ["Матрица", "Начало", "Зеленая", "миля", "Побег", "рыцарь", "Темный", "Интерстеллар", "Брат", "Сталкер",
+         "Солярис", "Остров", "Город", "Ночь", "Море", "Небо", "Последний", "Первый", "Тихий", "Дон"]
+SYLLABLES = ["ба", "ве", "го", "ду", "же", "зи", "ко", "ла", "ми", "но", "пе", "ро", "са", "ту", "фи",
+             "ха", "це", "чу", "ша", "ю", "ра", "ле", "ин", "ос", "ар"]
+
+
+def _vocabulary(size: int = 30_000) -> list[str]:
+    """Словарь псевдослов: реальные слова каталога + сгенерированные из слогов"""
+    rng = random.Random(0)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return [word.lower() for word in WORDS] + sorted(words)
+
+
+VOCABULARY = _vocabulary()
+# Частоты слов по закону Ципфа, как в естественном тексте
+_CUM_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+
+def make_temp_db(prefix: str = "filmoteka_bench_", profile: str = None):
+    """
+    Создать временную SQLite БД с таблицами; возвращает (engine, SessionLocal, путь)
+
+    profile - профиль настроек SQLite (по умолчанию из settings.sqlite_profile)
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=".db")
+    os.close(fd)
+    engine = create_db_engine(f"sqlite:///{path}", profile=profile)
+    init_db(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return engine, session_factory, path
+
+
+def remove_temp_db(engine, path: str) -> None:
+    """Закрыть соединения и удалить временную БД вместе с файлами WAL"""
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def synthetic_film(rng: random.Random) -> dict:
+    """Сгенерировать одну запись фильма"""
+    title = rng.choices(VOCABULARY, cum_weights=_CUM_WEIGHTS, k=rng.randint(1, 3))
+    return {
+        "title": " ".join(title).capitalize(),
+        "director": rng.choice(DIRECTORS),
+        "year": rng.randint(1920, 2024),
+        "rating": round(rng.uniform(1.0, 10.0), 1),
+        "genre": rng.choice(GENRES),
+        "description": " ".join(rng.choices(VOCABULARY, cum_weights=_CUM_WEIGHTS, k=rng.randint(5, 30))),
+    }
+
+
+def seed_films(engine, count: int, seed: int = 42, chunk_size: int = 10_000) -> None:
+    """
+    Заполнить таблицу films синтетическими данными пачками
+    (а также справочники жанров и режиссеров и статистику)
+    """
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for start in range(0, count, chunk_size):
+            rows = [synthetic_film(rng) for _ in range(min(chunk_size, count - start))]
+            conn.execute(insert(Film), rows)
+    with Session(bind=engine) as db:
+        rebuild_dimensions(db)
+        rebuild_stats(db)
+        db.commit()
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Перцентиль p (0-100) методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
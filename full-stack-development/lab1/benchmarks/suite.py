@@ -0,0 +1,295 @@
+"""
+Набор нагрузочных бенчмарков API с машиночитаемым результатом
+
+Для каждого размера каталога (--sizes) создается временная БД с синтетическими
+фильмами, и приложение main.app нагружается в том же процессе (httpx.ASGITransport,
+без сети) сценариями:
+    filters     - матрица фильтров и сортировок GET /films
+    deep_pages  - глубокая offset-пагинация и keyset-пагинация по курсору
+    search      - полнотекстовый поиск
+    stats       - статистика и фасеты
+    detail      - карточка фильма по id
+    crud        - создание, изменение и удаление фильмов
+    mixed       - смесь чтений (90%) и записей (10%)
+Каждый сценарий выполняет --requests запросов в --concurrency параллельных
+клиентах; печатается таблица RPS и p50/p95/p99, а с --output результат
+сохраняется в JSON.
+
+С --baseline результат сравнивается с сохраненным ранее: если ошибок стало
+больше или RPS упал либо p95 вырос больше чем на --margin (доля), команда
+завершается с кодом 1.
+--input сравнивает уже сохраненный результат без нового прогона.
+
+test_api.py остается ручной проверкой ответов запущенного сервера.
+
+Запуск из папки lab1 (нужен httpx):
+    python -m benchmarks.suite --sizes 10000 100000 --output bench.json
+    python -m benchmarks.suite --sizes 10000 --baseline bench.json --margin 0.2
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.bench_search import QUERIES
+from benchmarks.common import DIRECTORS, GENRES, make_temp_db, remove_temp_db, seed_films, percentile, synthetic_film
+from cache import count_cache, film_cache, list_cache
+from database import get_db, get_read_db
+from main import app
+
+# Комбинации фильтров GET /films (как в manage.py explain) и колонки сортировки
+FILTERS = [
+    {},
+    {"year_min": 1990, "year_max": 2000},
+    {"rating_min": 8.0},
+    {"year_min": 1990, "year_max": 2000, "rating_min": 8.0},
+    {"genre": "драма"},
+    {"genre": "драма", "genre_exact": "true"},
+    {"genre": "драма", "genre_exact": "true", "rating_min": 8.0},
+    {"genre_id": 1},
+]
+SORTS = ["id", "title", "year", "rating", "created_at"]
+
+
+class Context:
+    """Состояние прогона, общее для клиентов сценария"""
+
+    def __init__(self, films: int):
+        self.films = films
+        # id фильмов, созданных сценарием (их можно удалять)
+        self.created: list[int] = []
+        # Курсоры следующих страниц для keyset-пагинации
+        self.cursors: list[str] = []
+
+    def film_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.films)
+
+
+def _filters(rng: random.Random, ctx: Context):
+    params = {**rng.choice(FILTERS), "sort_by": rng.choice(SORTS),
+              "sort_order": rng.choice(["asc", "desc"]), "size": 20}
+    return "GET", "/films", params, None
+
+
+def _deep_pages(rng: random.Random, ctx: Context):
+    if rng.random() < 0.5:
+        last_page = max(1, ctx.films // 20)
+        return "GET", "/films", {"page": rng.randint(last_page // 2, last_page), "size": 20, "sort_by": "year"}, None
+    cursor = ctx.cursors.pop() if ctx.cursors and rng.random() < 0.9 else ""
+    return "GET", "/films", {"cursor": cursor, "size": 20, "sort_by": "year"}, None
+
+
+def _search(rng: random.Random, ctx: Context):
+    return "GET", f"/films/search/{rng.choice(QUERIES)}", {"size": 20}, None
+
+
+def _stats(rng: random.Random, ctx: Context):
+    if rng.random() < 0.5:
+        return "GET", "/films/stats/overview", None, None
+    return "GET", "/films/facets", rng.choice(FILTERS), None
+
+
+def _detail(rng: random.Random, ctx: Context):
+    return "GET", f"/films/{ctx.film_id(rng)}", None, None
+
+
+def _crud(rng: random.Random, ctx: Context):
+    action = rng.random()
+    if action < 0.4:
+        return "POST", "/films", None, synthetic_film(rng)
+    if action < 0.8:
+        changes = rng.choice([
+            {"rating": round(rng.uniform(1.0, 10.0), 1)},
+            {"genre": rng.choice(GENRES)},
+            {"director": rng.choice(DIRECTORS), "year": rng.randint(1920, 2024)},
+        ])
+        return "PUT", f"/films/{ctx.film_id(rng)}", None, changes
+    if ctx.created:
+        return "DELETE", f"/films/{ctx.created.pop()}", None, None
+    return "POST", "/films", None, synthetic_film(rng)
+
+
+def _mixed(rng: random.Random, ctx: Context):
+    if rng.random() < 0.1:
+        return _crud(rng, ctx)
+    return rng.choices([_filters, _detail, _search, _stats, _deep_pages], weights=[40, 30, 15, 10, 5])[0](rng, ctx)
+
+
+SCENARIOS = {
+    "filters": _filters,
+    "deep_pages": _deep_pages,
+    "search": _search,
+    "stats": _stats,
+    "detail": _detail,
+    "crud": _crud,
+    "mixed": _mixed,
+}
+
+
+async def _client(client: httpx.AsyncClient, scenario, ctx: Context, seed: int, budget: list, out: dict) -> None:
+    rng = random.Random(seed)
+    while budget[0] > 0:
+        budget[0] -= 1
+        method, url, params, body = scenario(rng, ctx)
+        started = time.perf_counter()
+        response = await client.request(method, url, params=params, json=body)
+        out["latencies"].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            out["errors"] += 1
+            continue
+        if method == "POST":
+            ctx.created.append(response.json()["id"])
+        elif "cursor" in (params or {}):
+            next_cursor = response.json().get("next_cursor")
+            if next_cursor:
+                ctx.cursors.append(next_cursor)
+
+
+async def _run_scenario(name: str, films: int, requests: int, concurrency: int, seed: int) -> dict:
+    ctx = Context(films)
+    budget = [requests]
+    outs = [{"latencies": [], "errors": 0} for _ in range(concurrency)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client(client, SCENARIOS[name], ctx, seed + i, budget, outs[i]) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    latencies = [value for out in outs for value in out["latencies"]]
+    return {
+        "size": films,
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": sum(out["errors"] for out in outs),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def run_suite(sizes: list[int], scenarios: list[str], requests: int, concurrency: int, seed: int) -> list[dict]:
+    """Прогнать сценарии на каталогах каждого размера"""
+    results = []
+    for size in sizes:
+        engine, session_factory, path = make_temp_db()
+        try:
+            print(f"Заполнение каталога: {size} фильмов...", file=sys.stderr)
+            seed_films(engine, size, seed=seed)
+
+            def override_get_db():
+                db = session_factory()
+                try:
+                    yield db
+                finally:
+                    db.close()
+
+            app.dependency_overrides[get_db] = override_get_db
+            app.dependency_overrides[get_read_db] = override_get_db
+            for name in scenarios:
+                for cache in (count_cache, list_cache, film_cache):
+                    cache.clear()
+                result = asyncio.run(_run_scenario(name, size, requests, concurrency, seed))
+                _print_row(result)
+                results.append(result)
+        finally:
+            app.dependency_overrides.clear()
+            remove_temp_db(engine, path)
+    return results
+
+
+def _print_row(result: dict) -> None:
+    print(f"{result['size']:>9} {result['scenario']:<12}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+          f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['errors']:>8}")
+
+
+def compare(results: list[dict], baseline: list[dict], margin: float) -> list[str]:
+    """
+    Сравнить результаты с базовыми
+
+    Returns:
+        Описания регрессий: ошибок больше, чем в базовом, или RPS ниже базового
+        либо p95 выше базового больше чем на margin
+    """
+    base = {(item["size"], item["scenario"]): item for item in baseline}
+    regressions = []
+    for result in results:
+        old = base.get((result["size"], result["scenario"]))
+        if old is None:
+            continue
+        name = f"{result['size']}/{result['scenario']}"
+        # Быстрые ответы с ошибками не должны сойти за ускорение
+        if result["errors"] > old["errors"]:
+            regressions.append(f"{name}: ошибок {result['errors']} > {old['errors']}")
+        if result["rps"] < old["rps"] * (1 - margin):
+            regressions.append(f"{name}: RPS {result['rps']:.1f} < {old['rps']:.1f}")
+        if result["p95_ms"] > old["p95_ms"] * (1 + margin):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} мс > {old['p95_ms']:.1f} мс")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Размеры каталога (например, 10000 100000 1000000)")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help="Сценарии нагрузки")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных клиентов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора данных и запросов")
+    parser.add_argument("--no-cache", action="store_true", help="Отключить кэши приложения")
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--margin", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    parser.add_argument("--input", help="Не запускать нагрузку, а сравнить этот JSON с --baseline")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        if args.no_cache:
+            for cache in (count_cache, list_cache, film_cache):
+                cache.maxsize = 0
+        print(f"{'фильмов':>9} {'сценарий':<12}{'RPS':>9}{'p50, мс':>9}{'p95, мс':>9}{'p99, мс':>9}{'ошибок':>8}")
+        report = {
+            "meta": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "cache": not args.no_cache,
+            },
+            "results": run_suite(args.sizes, args.scenarios, args.requests, args.concurrency, args.seed),
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report["results"], baseline["results"], args.margin)
+    if regressions:
+        print(f"Регрессии относительно {args.baseline} (допуск {args.margin:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"Регрессий относительно {args.baseline} нет (допуск {args.margin:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
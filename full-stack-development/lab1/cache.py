@@ -0,0 +1,257 @@
+"""
+Кэши в памяти процесса, зависящие от содержимого таблицы films
+
+Инвалидация основана на поколениях: поколение - это версия данных films
+из счетчика change_counters, который растет на 1 в каждой записывающей
+транзакции crud.py; после коммита вызывается invalidate_films() с новой
+версией. Ключи кэшей включают поколение, снятое до чтения из БД, поэтому
+результат запроса, начавшегося до записи, никогда не будет прочитан после нее.
+Та же версия служит основой ETag списков (см. conditional.py).
+Записи других процессов доходят до кэшей через журнал изменений (invalidation.py).
+
+Кэш карточек фильмов (film_cache) хранит готовый JSON FilmResponse
+по id и сбрасывается точечно при изменении или удалении фильма.
+Его хранилище подключаемое (см. CacheBackend и load_backend), чтобы
+несколько процессов uvicorn могли использовать общий кэш.
+"""
+import importlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+from config import settings
+
+
+class CacheBackend:
+    """
+    Интерфейс хранилища кэша
+
+    Реализация должна быть потокобезопасной. Для общих хранилищ (несколько
+    процессов) ключи - строки, значения - bytes. Конструктор принимает
+    maxsize и ttl (секунды, None - без ограничения времени жизни).
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def get_many(self, keys: list) -> list:
+        """Значения по списку ключей (None для промахов); общие хранилища могут читать одним запросом"""
+        return [self.get(key) for key in keys]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Счетчики попаданий, промахов и вытеснений"""
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """LRU-кэш в памяти процесса с ограничением по числу записей и времени жизни"""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class NullCache(CacheBackend):
+    """Отключенный кэш: ничего не хранит"""
+
+    def __init__(self, maxsize: int = 0, ttl: Optional[float] = None):
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"size": 0, "maxsize": 0, "hits": 0, "misses": self.misses, "evictions": 0, "expirations": 0}
+
+
+def load_backend(spec: str, maxsize: int, ttl: Optional[float]) -> CacheBackend:
+    """
+    Создать хранилище кэша по имени из настроек
+
+    Args:
+        spec: "memory", "none" или путь к классу "module:ClassName",
+              реализующему CacheBackend (например, общий кэш для всех процессов)
+    """
+    if spec == "memory":
+        return MemoryCache(maxsize=maxsize, ttl=ttl)
+    if spec == "none":
+        return NullCache()
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Неизвестное хранилище кэша: {spec!r}")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(maxsize=maxsize, ttl=ttl)
+
+
+_generation = 0
+_last_modified: Optional[datetime] = None
+_generation_lock = Lock()
+
+# Кэш COUNT(*) по сигнатуре фильтров: (поколение, *фильтры) -> total
+count_cache = MemoryCache(maxsize=settings.count_cache_size)
+
+# Кэш страниц списка: (поколение, *нормализованные параметры) -> (id фильмов, total)
+list_cache = MemoryCache(maxsize=settings.list_cache_size)
+
+# Кэш карточек фильмов: "film:<id>" -> JSON FilmResponse (bytes)
+film_cache = load_backend(settings.film_cache_backend, settings.film_cache_size, settings.film_cache_ttl)
+
+
+def films_generation() -> int:
+    """Текущее поколение (версия) данных таблицы films"""
+    return _generation
+
+
+def films_last_modified() -> Optional[datetime]:
+    """Время последнего известного изменения таблицы films"""
+    return _last_modified
+
+
+def set_films_version(version: int, changed_at: Optional[datetime]) -> None:
+    """
+    Запомнить версию данных films, загруженную из БД (при старте)
+
+    Версия ниже текущего поколения означает другую БД (например, временную
+    в бенчмарках): кэши прежней БД сбрасываются, поколение берется из новой,
+    чтобы оно и дальше совпадало с версией данных.
+    """
+    global _generation, _last_modified
+    with _generation_lock:
+        if version < _generation:
+            count_cache.clear()
+            list_cache.clear()
+            film_cache.clear()
+        _generation = version
+        _last_modified = changed_at
+
+
+def film_key(film_id: int) -> str:
+    """Ключ карточки фильма в film_cache"""
+    return f"film:{film_id}"
+
+
+def set_film_cards(cards: dict, generation: int) -> None:
+    """
+    Положить карточки (id -> bytes) в film_cache, если поколение все еще равно generation
+
+    Проверка и запись выполняются под блокировкой поколения: запись
+    не может увеличить поколение между ними, а удаление карточек
+    в invalidate_films идет после увеличения и сотрет только что положенные.
+    """
+    with _generation_lock:
+        if _generation != generation:
+            return
+        for film_id, card in cards.items():
+            film_cache.set(film_key(film_id), card)
+
+
+def invalidate_films(film_ids=(), version: Optional[int] = None, changed_at: Optional[datetime] = None) -> None:
+    """
+    Отметить изменение таблицы films и сбросить зависящие от нее кэши
+
+    Поколение равно версии данных: процессы, узнавшие о записях в разном
+    порядке (см. invalidation.py), приходят к одному поколению, и один ETag
+    списка означает одни данные во всех процессах.
+
+    Args:
+        film_ids: id измененных или удаленных фильмов (их карточки удаляются из film_cache)
+        version: Новая версия данных из change_counters (None - просто следующее поколение)
+        changed_at: Время изменения
+    """
+    global _generation, _last_modified
+    with _generation_lock:
+        if version is None or version > _generation:
+            _generation = _generation + 1 if version is None else version
+            if changed_at is not None:
+                _last_modified = changed_at
+    count_cache.clear()
+    list_cache.clear()
+    # Поколение увеличено до удаления карточек: чтение, начатое до записи,
+    # увидит новое поколение и не положит в кэш устаревшую карточку
+    for film_id in film_ids:
+        film_cache.delete(film_key(film_id))
+
+
+def cache_stats() -> dict:
+    """Счетчики всех кэшей"""
+    return {
+        "generation": _generation,
+        "film": film_cache.stats(),
+        "count": count_cache.stats(),
+        "list": list_cache.stats(),
+    }
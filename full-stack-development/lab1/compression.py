@@ -0,0 +1,152 @@
+"""
+Сжатие ответов gzip / brotli
+
+CompressionMiddleware сжимает тело ответа, если клиент принимает сжатие
+(Accept-Encoding), тело не меньше compression_minimum_size и тип содержимого
+не исключен настройкой compression_excluded_types. Brotli используется,
+если установлен пакет brotli и клиент его принимает, иначе - gzip.
+
+Потоковые ответы (StreamingResponse выгрузки каталога) не сжимаются:
+они отдаются клиенту по мере формирования, а буферизация для сжатия
+свела бы это на нет. Сильный ETag сжатого ответа становится слабым:
+сжатое представление отличается побайтно, но совпадает по смыслу,
+поэтому условные запросы (conditional.py) продолжают работать.
+"""
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def available_encodings() -> list[str]:
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str, encodings: list[str]) -> Optional[str]:
+    """
+    Выбрать кодировку по заголовку Accept-Encoding (с учетом q=0 и *)
+
+    Из принятых клиентом кодировок с наибольшим q выбирается первая по encodings.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    """Сжать тело ответа"""
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов
+
+    Args:
+        minimum_size: Минимальный размер тела для сжатия, байт
+        gzip_level: Уровень gzip (1-9)
+        brotli_quality: Качество brotli (0-11)
+        excluded_types: Префиксы Content-Type, которые не сжимаются
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+        excluded_types: tuple = ()
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_types = tuple(excluded_types)
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(self.app, scope, receive)
+
+
+class _CompressedResponder:
+    """Состояние одного ответа: start задерживается до первого куска тела"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.handle)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return not content_type.startswith(self.middleware.excluded_types)
+
+    async def handle(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._compressible(Headers(raw=message["headers"]))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        # Потоковый ответ (больше одного куска) или маленькое тело - без сжатия
+        if message.get("more_body", False) or len(body) < self.middleware.minimum_size:
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        compressed = compress(body, self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed})
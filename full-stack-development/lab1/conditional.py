@@ -0,0 +1,108 @@
+"""
+Условные GET-запросы: ETag, Last-Modified и ответ 304 Not Modified
+
+Карточка фильма получает ETag по хэшу своего JSON (метки времени SQLite
+имеют точность до секунды, поэтому одного updated_at недостаточно).
+Списки, поиск и статистика получают ETag по версии данных films
+(cache.films_generation()) и параметрам запроса, поэтому 304 отдается
+без обращения к БД. Эти ETag сильные: при одной версии и одних параметрах
+ответ совпадает побайтно (сжатый ответ получает слабый, см. compression.py).
+
+Last-Modified точен до секунды, поэтому дата изменения, случившегося
+в текущую секунду, не отдается и не дает 304 (RFC 9110, раздел 8.8.2.2):
+вторая запись в ту же секунду иначе не изменила бы дату.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Клиент может хранить ответ, но обязан перепроверять его по ETag
+CACHE_CONTROL = "no-cache"
+
+
+def content_etag(content: bytes) -> str:
+    """Сильный ETag по содержимому ответа"""
+    return '"' + blake2b(content, digest_size=10).hexdigest() + '"'
+
+
+def version_etag(scope: str, version: int, request: Request) -> str:
+    """
+    ETag ответа, зависящего только от версии данных и параметров запроса
+
+    Параметры сортируются, чтобы ?a=1&b=2 и ?b=2&a=1 давали один ETag.
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = blake2b(f"{scope}|{request.url.path}|{params}".encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    """Дата в формате HTTP (IMF-fixdate); время без часового пояса считается UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _second(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _is_strong_date(last_modified: datetime) -> bool:
+    """Дата изменения не попадает в текущую секунду (в эту секунду возможна еще запись)"""
+    return _second(last_modified) < _second(datetime.now(timezone.utc))
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Проверить If-None-Match / If-Modified-Since (RFC 9110, раздел 13.2.2)
+
+    If-None-Match сравнивается слабым сравнением и имеет приоритет:
+    If-Modified-Since учитывается, только если If-None-Match не передан.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {_strip_weak(tag.strip()) for tag in if_none_match.split(",")}
+        return _strip_weak(etag) in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    since = _parse_http_date(if_modified_since)
+    if since is None:
+        return False
+    # HTTP-дата имеет точность до секунды
+    return _is_strong_date(last_modified) and _second(last_modified) <= since
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Заголовки валидаторов для ответа 200 или 304"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None and _is_strong_date(last_modified):
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Ответ 304 Not Modified без тела"""
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
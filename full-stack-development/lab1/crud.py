@@ -1,8 +1,231 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, desc, asc
-from typing import List, Optional
-from models import Film
-from schemas import FilmCreate, FilmUpdate
+from sqlalchemy import (
+    func, desc, asc, insert, update, delete, literal, literal_column, select, union_all, case, cast,
+    tuple_, Integer, String
+)
+from typing import List, NamedTuple, Optional, Any, Iterator, Sequence
+from database import mark_write
+from models import Film, Genre, ChangeCounter, film_genres, normalize_genre
+from schemas import FilmCreate, FilmUpdate, FilmResponse
+from cache import count_cache, film_cache, list_cache, film_key, films_generation, invalidate_films, set_film_cards
+from conditional import content_etag
+from serialization import FILM_FIELDS, dumps, project
+import dimensions
+import invalidation
+import search
+import stats
+
+# Колонки, по которым разрешена сортировка
+SORT_COLUMNS = {
+    "id": Film.id,
+    "title": Film.title,
+    "year": Film.year,
+    "rating": Film.rating,
+    "created_at": Film.created_at
+}
+
+# Колонки строк списков фильмов (поля FilmResponse): списки читаются
+# кортежами, без создания ORM-объектов (см. serialization.py)
+FILM_COLUMNS = tuple(getattr(Film, name) for name in FILM_FIELDS)
+
+
+def film_columns(fields: Optional[Sequence[str]] = None, sort_by: str = "id") -> tuple:
+    """
+    Колонки строк списка для проекции fields (None - все FILM_COLUMNS)
+    
+    Кроме запрошенных полей выбираются id и колонка сортировки: они нужны
+    кэшу страниц и курсору keyset-пагинации.
+    """
+    if fields is None:
+        return FILM_COLUMNS
+    needed = {*fields, "id", sort_by}
+    return tuple(column for name, column in zip(FILM_FIELDS, FILM_COLUMNS) if name in needed)
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, last_id: int) -> str:
+    """Закодировать позицию (значение ключа сортировки, id) в непрозрачный курсор"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"s": sort_by, "o": sort_order, "k": [value, last_id]}
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> tuple[Any, int]:
+    """
+    Раскодировать курсор в пару (значение колонки сортировки, id)
+
+    Raises:
+        ValueError: курсор поврежден или выдан для другой сортировки
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, last_id = payload["k"]
+        cursor_sort = (payload["s"], payload["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Некорректный курсор")
+    if cursor_sort != (sort_by, sort_order) or not isinstance(last_id, int):
+        raise ValueError("Курсор выдан для другой сортировки")
+    if sort_by == "created_at" and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, last_id
+
+
+def _keyset_bound(db: Session, sort_by: str, value: Any):
+    """Значение из курсора в виде, сравнимом с колонкой сортировки"""
+    if isinstance(value, datetime) and db.get_bind().dialect.name == "sqlite":
+        # server_default CURRENT_TIMESTAMP хранит дату текстом без микросекунд,
+        # поэтому сравниваем с текстом в том же формате
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt), String)
+    return value
+
+
+def _apply_sorting(query, sort_by: str, sort_order: str):
+    """Сортировка по колонке с id в качестве второго ключа (стабильный порядок)"""
+    sort_column = SORT_COLUMNS.get(sort_by, Film.id)
+    direction = desc if sort_order.lower() == "desc" else asc
+    if sort_column is Film.id:
+        return query.order_by(direction(Film.id))
+    return query.order_by(direction(sort_column), direction(Film.id))
+
+
+def _apply_keyset(db: Session, query, cursor: str, sort_by: str, sort_order: str):
+    """
+    Отфильтровать записи, идущие после позиции курсора
+
+    Условие записано сравнением пар (колонка, id) > (значение, id): его SQLite
+    превращает в поиск диапазона по индексу колонки, и страница стоит одинаково
+    на любой глубине. Равносильное "колонка > x OR (колонка = x AND id > y)"
+    индекс не использует и пропускает строки с начала индекса.
+    """
+    sort_by = sort_by if sort_by in SORT_COLUMNS else "id"
+    sort_order = sort_order.lower()
+    value, last_id = decode_cursor(cursor, sort_by, sort_order)
+    sort_column = SORT_COLUMNS[sort_by]
+    if sort_column is Film.id:
+        return query.filter(Film.id < last_id if sort_order == "desc" else Film.id > last_id)
+    position = tuple_(sort_column, Film.id)
+    bound = tuple_(_keyset_bound(db, sort_by, value), last_id)
+    return query.filter(position < bound if sort_order == "desc" else position > bound)
+
+
+def _next_cursor(films: List[Row], limit: int, sort_by: str, sort_order: str) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница последняя"""
+    if len(films) <= limit:
+        return None
+    sort_by = sort_by if sort_by in SORT_COLUMNS else "id"
+    last_film = films[limit - 1]
+    return encode_cursor(sort_by, sort_order.lower(), getattr(last_film, sort_by), last_film.id)
+
+
+def _apply_filters(
+    query,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None
+):
+    """Применить фильтры списка фильмов к запросу"""
+    if year_min is not None:
+        query = query.filter(Film.year >= year_min)
+    if year_max is not None:
+        query = query.filter(Film.year <= year_max)
+    if rating_min is not None:
+        query = query.filter(Film.rating >= rating_min)
+    if rating_max is not None:
+        query = query.filter(Film.rating <= rating_max)
+    if genre:
+        # Сравнение по нормализованному жанру: ILIKE в SQLite не знает регистра кириллицы
+        genre_key = normalize_genre(genre)
+        if genre_exact:
+            query = query.filter(Film.genre_key == genre_key)
+        else:
+            query = query.filter(Film.genre_key.like(f"%{genre_key}%"))
+    if genre_ids:
+        # Любой из жанров; подзапрос идет по индексу (genre_id, film_id)
+        query = query.filter(Film.id.in_(
+            select(film_genres.c.film_id).where(film_genres.c.genre_id.in_(genre_ids))
+        ))
+    if director_id is not None:
+        query = query.filter(Film.director_id == director_id)
+    return query
+
+
+def films_query(
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc"
+):
+    """Запрос SELECT списка фильмов с фильтрами и сортировкой get_films (без пагинации)"""
+    query = _apply_filters(
+        select(Film), year_min, year_max, rating_min, rating_max, genre, genre_exact, genre_ids, director_id
+    )
+    return _apply_sorting(query, sort_by, sort_order)
+
+
+# Имя счетчика изменений таблицы films в change_counters
+FILMS_COUNTER = "films"
+
+
+def ensure_change_counter(db: Session) -> None:
+    """Создать счетчик изменений films, если его нет"""
+    if db.get(ChangeCounter, FILMS_COUNTER) is None:
+        db.add(ChangeCounter(name=FILMS_COUNTER, version=0))
+        db.commit()
+
+
+def get_films_version(db: Session) -> tuple[int, Optional[datetime]]:
+    """Текущая версия данных films и время последнего изменения"""
+    counter = db.get(ChangeCounter, FILMS_COUNTER)
+    if counter is None:
+        return 0, None
+    return counter.version, counter.changed_at
+
+
+def _bump_films_version(db: Session) -> tuple[int, datetime]:
+    """
+    Увеличить версию данных films в текущей транзакции
+    
+    Вызванное первой командой транзакции, в SQLite сразу берет блокировку
+    записи: строки, прочитанные после этого, никто не изменит до коммита.
+    """
+    return tuple(db.execute(
+        update(ChangeCounter)
+        .where(ChangeCounter.name == FILMS_COUNTER)
+        .values(version=ChangeCounter.version + 1, changed_at=func.now())
+        .returning(ChangeCounter.version, ChangeCounter.changed_at)
+    ).one())
+
+
+def _commit_films_change(db: Session, film_ids=(), version: Optional[tuple[int, datetime]] = None) -> None:
+    """
+    Зафиксировать изменение films: увеличить версию данных в той же
+    транзакции (если она еще не увеличена), записать его в журнал для других
+    процессов (invalidation.py), закоммитить и сбросить зависящие кэши
+    """
+    version, changed_at = version or _bump_films_version(db)
+    invalidation.publish(db, version, changed_at, film_ids)
+    db.commit()
+    mark_write()
+    invalidation.note_local(version)
+    invalidate_films(film_ids, version, changed_at)
 
 
 def get_film(db: Session, film_id: int) -> Optional[Film]:
@@ -10,6 +233,127 @@ def get_film(db: Session, film_id: int) -> Optional[Film]:
     return db.query(Film).filter(Film.id == film_id).first()
 
 
+def get_film_rows_by_ids(db: Session, film_ids: List[int], columns: tuple = FILM_COLUMNS) -> List[Row]:
+    """
+    Получить строки колонок columns (по умолчанию FILM_COLUMNS, должны включать id)
+    по списку id одним запросом, в порядке списка (отсутствующие пропускаются)
+    """
+    if not film_ids:
+        return []
+    films = {row.id: row for row in db.query(*columns).filter(Film.id.in_(film_ids))}
+    return [films[film_id] for film_id in film_ids if film_id in films]
+
+
+class FilmCard(NamedTuple):
+    """Готовая карточка фильма для GET /films/{film_id}"""
+    content: bytes
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _pack_card(card: FilmCard) -> bytes:
+    """Карточка в bytes для film_cache: строка ETag, строка даты, JSON"""
+    modified = card.last_modified.isoformat() if card.last_modified else ""
+    return b"\n".join((card.etag.encode(), modified.encode(), card.content))
+
+
+def _unpack_card(packed: bytes) -> FilmCard:
+    etag, modified, content = packed.split(b"\n", 2)
+    return FilmCard(content, etag.decode(), datetime.fromisoformat(modified.decode()) if modified else None)
+
+
+def get_film_card(db: Session, film_id: int) -> Optional[FilmCard]:
+    """
+    Получить карточку фильма как готовый JSON FilmResponse с валидаторами
+    (ETag по содержимому и Last-Modified), с кэшем film_cache
+    
+    Returns:
+        FilmCard или None, если фильм не найден
+    """
+    key = film_key(film_id)
+    cached = film_cache.get(key)
+    if cached is not None:
+        return _unpack_card(cached)
+    
+    # Поколение снимается до чтения: если во время чтения фильм изменят,
+    # устаревшая карточка не попадет в кэш
+    generation = films_generation()
+    db_film = get_film(db, film_id)
+    if db_film is None:
+        return None
+    card = _build_card(db_film)
+    set_film_cards({film_id: _pack_card(card)}, generation)
+    return card
+
+
+def _build_card(db_film: Film) -> FilmCard:
+    content = FilmResponse.model_validate(db_film).model_dump_json().encode()
+    return FilmCard(content, content_etag(content), db_film.updated_at or db_film.created_at)
+
+
+def project_card(card: FilmCard, fields: Optional[Sequence[str]]) -> FilmCard:
+    """Карточка только с полями fields (ETag - по новому содержимому)"""
+    if fields is None:
+        return card
+    content = dumps(project(json.loads(card.content), fields))
+    return FilmCard(content, content_etag(content), card.last_modified)
+
+
+def get_film_cards(db: Session, film_ids: Sequence[int]) -> tuple[List[FilmCard], List[int]]:
+    """
+    Получить карточки нескольких фильмов: сначала из film_cache,
+    остальные - одним запросом IN
+    
+    Returns:
+        Карточки в порядке film_ids (повторы отбрасываются) и id ненайденных фильмов
+    """
+    film_ids = list(dict.fromkeys(film_ids))
+    cards = {}
+    for film_id, cached in zip(film_ids, film_cache.get_many([film_key(film_id) for film_id in film_ids])):
+        if cached is not None:
+            cards[film_id] = _unpack_card(cached)
+    
+    misses = [film_id for film_id in film_ids if film_id not in cards]
+    if misses:
+        generation = films_generation()
+        fetched = {film.id: _build_card(film) for film in db.query(Film).filter(Film.id.in_(misses))}
+        set_film_cards({film_id: _pack_card(card) for film_id, card in fetched.items()}, generation)
+        cards.update(fetched)
+    
+    found = [cards[film_id] for film_id in film_ids if film_id in cards]
+    missing = [film_id for film_id in film_ids if film_id not in cards]
+    return found, missing
+
+
+def _fetch_page(query, skip: int, limit: int, count_key: tuple, include_total: bool) -> tuple[List[Row], Optional[int]]:
+    """
+    Выбрать страницу и (опционально) общее число записей
+    
+    total берется из count_cache по сигнатуре фильтров; при промахе страница
+    и total получаются одним запросом с оконной функцией COUNT(*) OVER()
+    (total остается последней колонкой строк страницы).
+    """
+    if not include_total:
+        return query.offset(skip).limit(limit).all(), None
+    
+    # Поколение снимается до чтения, чтобы не закэшировать устаревший total
+    key = (films_generation(),) + count_key
+    total = count_cache.get(key)
+    if total is not None:
+        return query.offset(skip).limit(limit).all(), total
+    
+    rows = query.add_columns(func.count().over()).offset(skip).limit(limit).all()
+    if rows:
+        films = rows
+        total = rows[0][-1]
+    else:
+        # Страница за пределами выборки - оконная функция не вернула total
+        films = []
+        total = query.order_by(None).count()
+    count_cache.set(key, total)
+    return films, total
+
+
 def get_films(
     db: Session,
     skip: int = 0,
@@ -19,9 +363,14 @@ def get_films(
     rating_min: Optional[float] = None,
     rating_max: Optional[float] = None,
     genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None,
     sort_by: str = "id",
-    sort_order: str = "asc"
-) -> tuple[List[Film], int]:
+    sort_order: str = "asc",
+    include_total: bool = True,
+    fields: Optional[Sequence[str]] = None
+) -> tuple[List[Row], Optional[int]]:
     """
     Получить список фильмов с фильтрацией, сортировкой и пагинацией
     
@@ -33,128 +382,471 @@ def get_films(
         year_max: Максимальный год
         rating_min: Минимальный рейтинг
         rating_max: Максимальный рейтинг
-        genre: Жанр
+        genre: Жанр (подстрока без учета регистра)
+        genre_exact: Искать жанр целиком, а не по подстроке (использует индекс)
+        genre_ids: id жанров из справочника (фильм подходит, если есть любой из них)
+        director_id: id режиссера из справочника
         sort_by: Поле для сортировки (id, title, year, rating)
         sort_order: Порядок сортировки (asc, desc)
+        include_total: Считать ли общее количество (иначе total = None)
+        fields: Поля фильма для выборки (None - все; см. film_columns)
+    
+    Returns:
+        Строки колонок film_columns(fields, sort_by) и total
+    
+    Страница кэшируется в list_cache как список id и total; при попадании
+    фильмы загружаются по первичному ключу без фильтрации и сортировки.
     """
-    query = db.query(Film)
+    genre = genre or None
+    genre_exact = bool(genre and genre_exact)
+    genre_ids = tuple(sorted(set(genre_ids))) if genre_ids else None
+    sort_by = sort_by if sort_by in SORT_COLUMNS else "id"
+    sort_order = sort_order.lower()
+    filters = (year_min, year_max, rating_min, rating_max, genre, genre_exact, genre_ids, director_id)
+    columns = film_columns(fields, sort_by)
     
-    # Применение фильтров
-    if year_min is not None:
-        query = query.filter(Film.year >= year_min)
-    if year_max is not None:
-        query = query.filter(Film.year <= year_max)
-    if rating_min is not None:
-        query = query.filter(Film.rating >= rating_min)
-    if rating_max is not None:
-        query = query.filter(Film.rating <= rating_max)
-    if genre:
-        query = query.filter(Film.genre.ilike(f"%{genre}%"))
+    # Поколение снимается до чтения, чтобы не закэшировать устаревшую страницу
+    page_key = (films_generation(), "films", *filters, sort_by, sort_order, skip, limit, include_total)
+    cached = list_cache.get(page_key)
+    if cached is not None:
+        film_ids, total = cached
+        return get_film_rows_by_ids(db, film_ids, columns), total
     
-    # Подсчет общего количества (до применения сортировки и лимита)
-    total = query.count()
+    query = _apply_filters(db.query(*columns), *filters)
     
     # Сортировка
-    sort_column = {
-        "id": Film.id,
-        "title": Film.title,
-        "year": Film.year,
-        "rating": Film.rating,
-        "created_at": Film.created_at
-    }.get(sort_by, Film.id)
-    
-    if sort_order.lower() == "desc":
-        query = query.order_by(desc(sort_column))
-    else:
-        query = query.order_by(asc(sort_column))
-    
-    # Применение пагинации
-    films = query.offset(skip).limit(limit).all()
+    query = _apply_sorting(query, sort_by, sort_order)
     
+    # Пагинация и общее количество
+    films, total = _fetch_page(query, skip, limit, ("films", *filters), include_total)
+    list_cache.set(page_key, ([film.id for film in films], total))
     return films, total
 
 
-def search_films_by_title(db: Session, title_query: str, skip: int = 0, limit: int = 10) -> tuple[List[Film], int]:
-    """Поиск фильмов по названию"""
-    query = db.query(Film).filter(Film.title.ilike(f"%{title_query}%"))
-    total = query.count()
-    films = query.offset(skip).limit(limit).all()
-    return films, total
+def get_films_keyset(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 10,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    fields: Optional[Sequence[str]] = None
+) -> tuple[List[Row], Optional[str]]:
+    """
+    Получить страницу фильмов по курсору (keyset-пагинация)
+    
+    В отличие от offset-пагинации стоимость страницы не зависит от ее
+    глубины, а вставки новых фильмов не сдвигают уже прочитанные страницы.
+    
+    Args:
+        cursor: Курсор из next_cursor предыдущей страницы (None - первая страница)
+        остальные параметры - как в get_films
+    
+    Returns:
+        Строки колонок film_columns(fields, sort_by) и курсор следующей страницы
+        (None, если страница последняя)
+    
+    Raises:
+        ValueError: курсор некорректен или выдан для другой сортировки
+    """
+    query = _apply_filters(
+        db.query(*film_columns(fields, sort_by)),
+        year_min, year_max, rating_min, rating_max, genre, genre_exact, genre_ids, director_id
+    )
+    if cursor:
+        query = _apply_keyset(db, query, cursor, sort_by, sort_order)
+    query = _apply_sorting(query, sort_by, sort_order)
+    
+    # Лишняя запись показывает, есть ли следующая страница
+    films = query.limit(limit + 1).all()
+    return films[:limit], _next_cursor(films, limit, sort_by, sort_order)
+
+
+# Колонки выгрузки каталога (см. export.py)
+EXPORT_COLUMNS = ["id", "title", "director", "year", "rating", "genre", "description", "created_at", "updated_at"]
+
+
+def iter_film_rows(
+    db: Session,
+    batch_size: int = 1000,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc"
+) -> Iterator[tuple]:
+    """
+    Итерировать все фильмы по фильтрам get_films кортежами колонок EXPORT_COLUMNS
+    
+    Строки читаются из курсора пачками по batch_size (yield_per),
+    ORM-объекты не создаются.
+    """
+    query = select(*(getattr(Film, column) for column in EXPORT_COLUMNS))
+    query = _apply_filters(
+        query, year_min, year_max, rating_min, rating_max, genre, genre_exact, genre_ids, director_id
+    )
+    query = _apply_sorting(query, sort_by, sort_order)
+    for row in db.execute(query.execution_options(yield_per=batch_size)):
+        yield tuple(row)
+
+
+def get_film_facets(
+    db: Session,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    rating_min: Optional[float] = None,
+    rating_max: Optional[float] = None,
+    genre: Optional[str] = None,
+    genre_exact: bool = False,
+    genre_ids: Optional[Sequence[int]] = None,
+    director_id: Optional[int] = None
+) -> dict:
+    """
+    Фасеты для фильтров get_films: число фильмов по жанрам, десятилетиям
+    и интервалам рейтинга
+    
+    Все три разбивки считаются одним запросом: отфильтрованные фильмы
+    материализуются в CTE, по которому группируют три ветви UNION ALL.
+    Результат кэшируется в list_cache до следующей записи.
+    """
+    genre_ids = tuple(sorted(set(genre_ids))) if genre_ids else None
+    filters = (year_min, year_max, rating_min, rating_max, genre or None, bool(genre and genre_exact),
+               genre_ids, director_id)
+    key = (films_generation(), "facets", *filters)
+    cached = list_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    filtered = _apply_filters(select(Film.id, Film.year, Film.rating), *filters).cte("filtered")
+    filtered = filtered.prefix_with("MATERIALIZED") if db.get_bind().dialect.name == "sqlite" else filtered
+    decade = (filtered.c.year // 10) * 10
+    # CAST отбрасывает дробную часть (рейтинг неотрицательный); 10 попадает в интервал [9, 10]
+    bucket = case((filtered.c.rating >= 9, 9), else_=cast(filtered.c.rating, Integer))
+    rows = db.execute(union_all(
+        select(literal("genre"), Genre.id, func.count(), Genre.name)
+        .select_from(filtered.join(film_genres, film_genres.c.film_id == filtered.c.id)
+                     .join(Genre, Genre.id == film_genres.c.genre_id))
+        .group_by(Genre.id, Genre.name),
+        select(literal("decade"), decade, func.count(), literal(None, String)).group_by(decade),
+        select(literal("rating"), bucket, func.count(), literal(None, String)).group_by(bucket),
+    )).all()
+    
+    genres, decades, ratings = [], [], []
+    for facet, value, count, name in rows:
+        if facet == "genre":
+            genres.append({"id": value, "name": name, "count": count})
+        elif facet == "decade":
+            decades.append({"decade": value, "count": count})
+        else:
+            ratings.append({"min": value, "max": value + 1, "count": count})
+    genres.sort(key=lambda item: (-item["count"], item["name"]))
+    decades.sort(key=lambda item: item["decade"])
+    ratings.sort(key=lambda item: item["min"])
+    facets = {
+        "total": sum(item["count"] for item in decades),
+        "genres": genres,
+        "decades": decades,
+        "ratings": ratings
+    }
+    list_cache.set(key, facets)
+    return facets
+
+
+def _search_page(db: Session, hits, limit: int, columns: tuple = FILM_COLUMNS) -> List[Row]:
+    """
+    Страница поиска: строки колонок columns с последней колонкой relevance;
+    hits упорядочиваются и ограничиваются до присоединения films
+    """
+    page = hits.order_by(literal_column("relevance"), literal_column("film_id")).limit(limit).subquery("hits")
+    return db.query(*columns, page.c.relevance).join(
+        page, page.c.film_id == Film.id
+    ).order_by(page.c.relevance, Film.id).all()
+
+
+def search_films_by_title(
+    db: Session,
+    title_query: str,
+    skip: int = 0,
+    limit: int = 10,
+    include_total: bool = True,
+    fields: Optional[Sequence[str]] = None
+) -> tuple[List[Row], Optional[int]]:
+    """
+    Полнотекстовый поиск фильмов по названию, режиссеру и описанию
+    
+    Слова запроса ищутся как префиксы без учета регистра, результаты
+    упорядочены по релевантности (совпадения в названии важнее).
+    На БД без FTS5 выполняется прежний поиск подстроки в названии.
+    fields - поля фильма для выборки, как в get_films.
+    """
+    columns = film_columns(fields)
+    if not search.is_supported(db):
+        query = db.query(*columns).filter(Film.title.ilike(f"%{title_query}%")).order_by(Film.id)
+        return _fetch_page(query, skip, limit, ("search", title_query), include_total)
+    
+    match_query = search.build_match_query(title_query)
+    if match_query is None:
+        return [], 0 if include_total else None
+    
+    total = None
+    if include_total:
+        key = (films_generation(), "search", match_query)
+        total = count_cache.get(key)
+        if total is None:
+            total = db.execute(search.count_query(match_query)).scalar()
+            count_cache.set(key, total)
+    return _search_page(db, search.hits_query(match_query).offset(skip), limit, columns), total
+
+
+def search_films_by_title_keyset(
+    db: Session,
+    title_query: str,
+    cursor: Optional[str] = None,
+    limit: int = 10,
+    fields: Optional[Sequence[str]] = None
+) -> tuple[List[Row], Optional[str]]:
+    """
+    Поиск фильмов с keyset-пагинацией (см. get_films_keyset)
+    
+    Ключ курсора - релевантность и id, порядок тот же, что в search_films_by_title.
+    """
+    columns = film_columns(fields)
+    if not search.is_supported(db):
+        query = db.query(*columns).filter(Film.title.ilike(f"%{title_query}%"))
+        if cursor:
+            query = _apply_keyset(db, query, cursor, "id", "asc")
+        films = query.order_by(Film.id).limit(limit + 1).all()
+        return films[:limit], _next_cursor(films, limit, "id", "asc")
+    
+    match_query = search.build_match_query(title_query)
+    if match_query is None:
+        return [], None
+    hits = search.hits_query(match_query)
+    if cursor:
+        last_rank, last_id = decode_cursor(cursor, "rank", "asc")
+        if not isinstance(last_rank, (int, float)):
+            raise ValueError("Некорректный курсор")
+        ranked = hits.subquery("ranked")
+        hits = select(ranked).where(tuple_(ranked.c.relevance, ranked.c.film_id) > tuple_(last_rank, last_id))
+    rows = _search_page(db, hits, limit + 1, columns)
+    if len(rows) <= limit:
+        return rows, None
+    last_row = rows[limit - 1]
+    return rows[:limit], encode_cursor("rank", "asc", last_row.relevance, last_row.id)
 
 
 def create_film(db: Session, film: FilmCreate) -> Film:
     """Создать новый фильм"""
-    db_film = Film(**film.dict())
-    db.add(db_film)
-    db.commit()
-    db.refresh(db_film)
-    return db_film
+    return create_films(db, [film])[0]
+
+
+def create_films(db: Session, films: List[FilmCreate]) -> List[Film]:
+    """
+    Создать фильмы одной транзакцией и вернуть их в порядке списка
+
+    id и created_at новых строк возвращаются через RETURNING той же вставки,
+    без refresh (отдельного SELECT) каждой строки; объекты отсоединены от сессии.
+    Версия увеличивается первой: одновременные создания с новым режиссером
+    или жанром ждут блокировку записи, а не получают нарушение уникальности.
+    """
+    version = _bump_films_version(db)
+    values = [film.dict() for film in films]
+    dimensions.assign_directors(db, values)
+    db_films = db.execute(insert(Film).returning(Film, sort_by_parameter_order=True), values).scalars().all()
+    dimensions.link_genres(db, [(db_film.id, db_film.genre) for db_film in db_films])
+    stats.apply_delta(db, added=[stats.film_key(db_film) for db_film in db_films])
+    for db_film in db_films:
+        db.expunge(db_film)
+    _commit_films_change(db, version=version)
+    return db_films
+
+
+def create_films_bulk(db: Session, films: List[dict]) -> int:
+    """
+    Создать пачку фильмов одной транзакцией
+    
+    Данные должны быть уже провалидированы (FilmCreate). Вставка выполняется
+    одним executemany без refresh каждой строки; id новых строк возвращаются
+    через RETURNING для связей с жанрами.
+    
+    Returns:
+        Число вставленных фильмов
+    """
+    if not films:
+        return 0
+    films = [dict(film) for film in films]
+    dimensions.assign_directors(db, films)
+    film_ids = db.execute(insert(Film).returning(Film.id, sort_by_parameter_order=True), films).scalars().all()
+    dimensions.link_genres(db, zip(film_ids, (film["genre"] for film in films)))
+    stats.apply_delta(db, added=[(film["year"], film["rating"], film["genre"]) for film in films])
+    _commit_films_change(db)
+    return len(films)
+
+
+# Поля фильма, изменение которых меняет статистику (см. stats.film_key)
+_STATS_FIELDS = {"year", "rating", "genre"}
+
+# Колонки ключа статистики для RETURNING
+_STATS_COLUMNS = (Film.year, Film.rating, Film.genre)
+
+
+def _update_values(db: Session, changes: dict) -> dict:
+    """Значения UPDATE по полям FilmUpdate вместе с производными колонками"""
+    values = dict(changes)
+    if "genre" in values:
+        values["genre_key"] = normalize_genre(values["genre"])
+    if "director" in values:
+        values["director_id"] = dimensions.director_ids(db, [values["director"]])[values["director"]]
+    return values
 
 
 def update_film(db: Session, film_id: int, film: FilmUpdate) -> Optional[Film]:
-    """Обновить фильм"""
-    db_film = get_film(db, film_id)
-    if not db_film:
-        return None
+    """
+    Обновить фильм
     
-    update_data = film.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_film, field, value)
+    Выполняется одним UPDATE ... RETURNING без предварительного чтения;
+    прежние значения читаются, только если меняются поля статистики.
+    Версия увеличивается первой: чтения справочников и прежних значений
+    идут уже под блокировкой записи (см. _bump_films_version).
+    """
+    changes = film.dict(exclude_unset=True)
+    if not changes:
+        return get_film(db, film_id)
     
-    db.commit()
-    db.refresh(db_film)
+    version = _bump_films_version(db)
+    old_key = None
+    if _STATS_FIELDS & changes.keys():
+        old_key = db.execute(select(*_STATS_COLUMNS).where(Film.id == film_id)).first()
+        if old_key is None:
+            db.rollback()
+            return None
+    
+    db_film = db.execute(
+        update(Film).where(Film.id == film_id).values(**_update_values(db, changes)).returning(Film)
+    ).scalar_one_or_none()
+    if db_film is None:
+        db.rollback()
+        return None
+    if "genre" in changes:
+        dimensions.unlink_genres(db, [film_id])
+        dimensions.link_genres(db, [(film_id, db_film.genre)])
+    if old_key is not None and stats.film_key(db_film) != tuple(old_key):
+        stats.apply_delta(db, added=[stats.film_key(db_film)], removed=[tuple(old_key)])
+    # Объект отсоединяется, чтобы коммит не сбросил загруженные RETURNING значения
+    db.expunge(db_film)
+    _commit_films_change(db, [film_id], version)
     return db_film
 
 
 def delete_film(db: Session, film_id: int) -> bool:
-    """Удалить фильм"""
-    db_film = get_film(db, film_id)
-    if not db_film:
+    """Удалить фильм (DELETE ... RETURNING без предварительного чтения)"""
+    removed_key = db.execute(
+        delete(Film).where(Film.id == film_id).returning(*_STATS_COLUMNS)
+    ).first()
+    if removed_key is None:
+        db.rollback()
         return False
     
-    db.delete(db_film)
-    db.commit()
+    dimensions.unlink_genres(db, [film_id])
+    stats.apply_delta(db, removed=[tuple(removed_key)])
+    _commit_films_change(db, [film_id])
     return True
 
 
-def get_film_stats(db: Session) -> dict:
-    """Получить статистику по фильмам"""
-    total_films = db.query(func.count(Film.id)).scalar()
-    
-    if total_films == 0:
-        return {
-            "total_films": 0,
-            "average_rating": 0.0,
-            "min_rating": 0.0,
-            "max_rating": 0.0,
-            "films_by_year": {},
-            "films_by_genre": {}
+def _apply_selection(statement, film_ids: Optional[Sequence[int]], filters: dict):
+    """Ограничить запрос списком id и/или фильтрами get_films"""
+    if film_ids:
+        statement = statement.filter(Film.id.in_(film_ids))
+    return _apply_filters(statement, **filters)
+
+
+def update_films_bulk(db: Session, changes: dict, film_ids: Optional[Sequence[int]] = None, **filters) -> int:
+    """
+    Изменить поля у набора фильмов одним UPDATE ... WHERE в одной транзакции
+    
+    Args:
+        changes: Новые значения полей (как FilmUpdate.dict(exclude_unset=True))
+        film_ids: id фильмов
+        filters: Фильтры get_films (year_min, ..., director_id)
+    
+    Returns:
+        Число измененных фильмов
+    """
+    # Версия увеличивается первой, чтобы прочитанные прежние значения
+    # и справочник режиссеров не изменились до UPDATE
+    version = _bump_films_version(db)
+    old_keys = None
+    if _STATS_FIELDS & changes.keys():
+        old_keys = {
+            row.id: (row.year, row.rating, row.genre)
+            for row in db.execute(
+                _apply_selection(select(Film.id, *_STATS_COLUMNS), film_ids, filters).with_for_update()
+            )
         }
     
-    stats = db.query(
-        func.avg(Film.rating).label('avg_rating'),
-        func.min(Film.rating).label('min_rating'),
-        func.max(Film.rating).label('max_rating')
-    ).first()
+    rows = db.execute(
+        _apply_selection(update(Film), film_ids, filters)
+        .values(**_update_values(db, changes))
+        .returning(Film.id, *_STATS_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        db.rollback()
+        return 0
     
-    # Статистика по годам
-    films_by_year = db.query(
-        Film.year,
-        func.count(Film.id).label('count')
-    ).group_by(Film.year).all()
-    
-    # Статистика по жанрам
-    films_by_genre = db.query(
-        Film.genre,
-        func.count(Film.id).label('count')
-    ).group_by(Film.genre).all()
-    
-    return {
-        "total_films": total_films,
-        "average_rating": round(stats.avg_rating or 0.0, 2),
-        "min_rating": stats.min_rating or 0.0,
-        "max_rating": stats.max_rating or 0.0,
-        "films_by_year": {str(year): count for year, count in films_by_year},
-        "films_by_genre": {genre: count for genre, count in films_by_genre}
-    }
+    updated_ids = [row.id for row in rows]
+    if "genre" in changes:
+        dimensions.unlink_genres(db, updated_ids)
+        dimensions.link_genres(db, ((film_id, changes["genre"]) for film_id in updated_ids))
+    if old_keys is not None:
+        stats.apply_delta(
+            db,
+            added=[(row.year, row.rating, row.genre) for row in rows],
+            removed=[old_keys[row.id] for row in rows]
+        )
+    _commit_films_change(db, updated_ids, version)
+    return len(rows)
+
+
+def delete_films_bulk(db: Session, film_ids: Optional[Sequence[int]] = None, **filters) -> int:
+    """
+    Удалить набор фильмов одним DELETE ... WHERE в одной транзакции
+    
+    Args:
+        film_ids: id фильмов
+        filters: Фильтры get_films (year_min, ..., director_id)
+    
+    Returns:
+        Число удаленных фильмов
+    """
+    rows = db.execute(
+        _apply_selection(delete(Film), film_ids, filters)
+        .returning(Film.id, *_STATS_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        db.rollback()
+        return 0
+    
+    deleted_ids = [row.id for row in rows]
+    dimensions.unlink_genres(db, deleted_ids)
+    stats.apply_delta(db, removed=[(row.year, row.rating, row.genre) for row in rows])
+    _commit_films_change(db, deleted_ids)
+    return len(rows)
+
 
+def get_film_stats(db: Session) -> dict:
+    """Получить статистику по фильмам (из материализованных таблиц, см. stats.py)"""
+    return stats.read_stats(db)
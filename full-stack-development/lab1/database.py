@@ -1,20 +1,115 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# SQLite база данных
-SQLALCHEMY_DATABASE_URL = "sqlite:///./filmoteka.db"
+from config import settings
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Основная база данных (по умолчанию SQLite, см. settings.database_url)
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+
+def sqlite_pragmas(profile: str = None) -> dict:
+    """Прагмы SQLite для профиля настроек (пустой словарь для default)"""
+    profile = profile or settings.sqlite_profile
+    if profile == "default":
+        return {}
+    return {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = None):
+    """
+    Создать engine с настройками пула из settings (и прагмами для SQLite)
+
+    Прагмы выполняются для каждого нового соединения пула: кроме journal_mode,
+    они действуют только в пределах соединения.
+    """
+    url = make_url(url)
+    pool_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url, pool_pre_ping=True, **pool_options)
+    if url.database in (None, "", ":memory:"):
+        # БД в памяти живет в одном соединении, пул SQLAlchemy выбирает сам
+        return create_engine(url, connect_args={"check_same_thread": False})
+
+    pragmas = sqlite_pragmas(profile)
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout},
+        **pool_options
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Реплики для чтения; выбираются по кругу
+replica_engines = [create_db_engine(url) for url in settings.database_replica_urls]
+_replica_cycle = itertools.cycle(replica_engines)
+_replica_lock = Lock()
+# Время последней записи этого процесса (см. settings.database_replica_lag)
+_last_write = 0.0
+
+
+def mark_write() -> None:
+    """Отметить запись в основную БД: ближайшие чтения пойдут в основную БД"""
+    global _last_write
+    _last_write = time.monotonic()
+
+
+def read_engine():
+    """Engine для чтения: очередная реплика или основная БД"""
+    if not replica_engines or time.monotonic() - _last_write < settings.database_replica_lag:
+        return engine
+    with _replica_lock:
+        return next(_replica_cycle)
+
+
+def ReadSessionLocal():
+    """Сессия только для чтения, привязанная к реплике (если они настроены)"""
+    return SessionLocal(bind=read_engine())
+
 Base = declarative_base()
 
+# Ограниченный пул потоков для блокирующих запросов к БД
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.db_threadpool_size,
+    thread_name_prefix="filmoteka-db"
+)
+
 
 def get_db():
-    """Dependency для получения сессии БД"""
+    """Dependency для получения сессии основной БД (чтение и запись)"""
     db = SessionLocal()
     try:
         yield db
@@ -22,7 +117,62 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Инициализация базы данных - создание таблиц"""
-    Base.metadata.create_all(bind=engine)
+def get_read_db():
+    """Dependency для эндпоинтов только для чтения: сессия реплики"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Выполнить синхронную функцию работы с БД из async-эндпоинта
+
+    В режиме threadpool функция выполняется в пуле db_executor, и медленный
+    запрос или блокировка записи SQLite не останавливают event loop.
+    В режиме inline функция вызывается напрямую (как раньше).
+    """
+    if settings.db_execution_mode == "inline":
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # Контекст копируется в поток, чтобы запросы к БД учитывались
+    # в метриках своего HTTP-запроса (см. metrics.py)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, partial(context.run, func, *args, **kwargs))
+
+
+def load_films_version(bind) -> None:
+    """Загрузить версию данных films в кэш процесса (основа ETag и поколений кэша)"""
+    from crud import get_films_version
+    from cache import set_films_version
+    import invalidation
+
+    with sessionmaker(bind=bind)() as db:
+        version, changed_at = get_films_version(db)
+    set_films_version(version, changed_at)
+    invalidation.reset(version)
+
+
+def init_db(bind=None):
+    """Создать или обновить схему БД (все миграции) и загрузить версию данных"""
+    import migrations
+
+    bind = bind or engine
+    migrations.migrate(bind)
+    load_films_version(bind)
+
+
+def check_db(bind=None):
+    """
+    Проверка БД при старте приложения: только версия схемы, без миграций
+
+    Raises:
+        migrations.SchemaVersionError: нужно выполнить python manage.py migrate
+    """
+    import migrations
 
+    bind = bind or engine
+    migrations.check_schema(bind)
+    load_films_version(bind)
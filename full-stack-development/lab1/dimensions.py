@@ -0,0 +1,117 @@
+"""
+Справочники жанров и режиссеров
+
+Film.genre и Film.director остаются строками, как их передает API, а при
+записи фильма раскладываются по справочникам genres и directors (по
+нормализованному написанию, см. models.normalize_name), поэтому "Драма"
+и "драма" - один жанр. На справочниках работают фильтры genre_id и
+director_id в GET /films и фасеты GET /films/facets.
+
+Строка жанра может содержать несколько жанров через запятую, точку
+с запятой или "/": фильм "Драма, Криминал" связан с двумя жанрами.
+"""
+import re
+from typing import Iterable
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import Film, Genre, Director, film_genres, normalize_genre, normalize_name
+
+_GENRE_SEPARATORS = re.compile(r"[,;/]")
+
+# Размер пачки при пересборке справочников и удалении связей
+REBUILD_CHUNK_SIZE = 5000
+
+
+def split_genres(genre: str) -> list[str]:
+    """Жанры из строки жанра фильма (без повторов, в исходном порядке)"""
+    names = {}
+    for part in _GENRE_SEPARATORS.split(genre):
+        name = " ".join(part.split())
+        if name:
+            names.setdefault(normalize_genre(name), name)
+    return list(names.values())
+
+
+def _resolve(db: Session, model, names: Iterable[str]) -> dict[str, int]:
+    """id записей справочника по нормализованному написанию; недостающие создаются"""
+    by_key = {}
+    for name in names:
+        by_key.setdefault(normalize_name(name), name)
+    if not by_key:
+        return {}
+    ids = dict(db.execute(select(model.key, model.id).where(model.key.in_(list(by_key)))).all())
+    missing = [{"name": name, "key": key} for key, name in by_key.items() if key not in ids]
+    if missing:
+        ids.update(db.execute(insert(model).returning(model.key, model.id), missing).all())
+    return ids
+
+
+def director_ids(db: Session, names: Iterable[str]) -> dict[str, int]:
+    """id режиссеров по имени (в том написании, в котором имена переданы)"""
+    names = list(names)
+    ids = _resolve(db, Director, names)
+    return {name: ids[normalize_name(name)] for name in names}
+
+
+def assign_directors(db: Session, films: list[dict]) -> None:
+    """Проставить director_id в данных фильмов перед вставкой"""
+    ids = director_ids(db, {film["director"] for film in films})
+    for film in films:
+        film["director_id"] = ids[film["director"]]
+
+
+def link_genres(db: Session, films: Iterable[tuple[int, str]]) -> None:
+    """
+    Связать фильмы с жанрами
+
+    Args:
+        films: Пары (id фильма, строка жанра); старые связи должны быть удалены
+    """
+    films = [(film_id, split_genres(genre)) for film_id, genre in films]
+    ids = _resolve(db, Genre, (name for _, names in films for name in names))
+    rows = [
+        {"film_id": film_id, "genre_id": ids[normalize_genre(name)]}
+        for film_id, names in films
+        for name in names
+    ]
+    if rows:
+        db.execute(insert(film_genres), rows)
+
+
+def unlink_genres(db: Session, film_ids: Iterable[int]) -> None:
+    """Удалить связи фильмов с жанрами (перед удалением фильма или сменой жанра)"""
+    film_ids = list(film_ids)
+    # Пачками: число параметров запроса в SQLite ограничено
+    for start in range(0, len(film_ids), REBUILD_CHUNK_SIZE):
+        chunk = film_ids[start:start + REBUILD_CHUNK_SIZE]
+        db.execute(delete(film_genres).where(film_genres.c.film_id.in_(chunk)))
+
+
+def rebuild_dimensions(db: Session) -> None:
+    """
+    Заполнить director_id и связи film_genres по всей таблице films заново
+    (после миграции или загрузки данных в обход crud; коммит за вызывающим)
+    """
+    db.execute(delete(film_genres))
+    set_director = (
+        update(Film.__table__)
+        .where(Film.__table__.c.id == bindparam("film_id"))
+        # updated_at присваивается сам себе, чтобы не сработал onupdate
+        .values(director_id=bindparam("new_director_id"), updated_at=Film.__table__.c.updated_at)
+    )
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Film.id, Film.genre, Film.director)
+            .where(Film.id > last_id)
+            .order_by(Film.id)
+            .limit(REBUILD_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        ids = director_ids(db, {row.director for row in rows})
+        db.execute(set_director, [{"film_id": row.id, "new_director_id": ids[row.director]} for row in rows])
+        link_genres(db, ((row.id, row.genre) for row in rows))
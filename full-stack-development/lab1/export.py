@@ -0,0 +1,83 @@
+"""
+Потоковая выгрузка каталога в NDJSON и CSV
+
+Строки читаются из БД пачками (yield_per) в виде кортежей колонок,
+без создания ORM-объектов и моделей FilmResponse, и сразу отдаются
+клиенту, поэтому память не зависит от размера выгрузки.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from database import ReadSessionLocal
+from crud import iter_film_rows, EXPORT_COLUMNS
+
+BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def _batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_ndjson(rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Строки фильмов в NDJSON, по пачке строк на кусок ответа"""
+    for batch in _batched(rows, BATCH_SIZE):
+        lines = (
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=_json_default)
+            for row in batch
+        )
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def format_csv(rows: Iterable[tuple]) -> Iterator[bytes]:
+    """Строки фильмов в CSV с заголовком (в UTF-8 с BOM, чтобы Excel открыл кириллицу)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batched(rows, BATCH_SIZE):
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_export(export_format: str, **filters) -> Iterator[bytes]:
+    """
+    Выгрузка фильмов по фильтрам в заданном формате
+
+    Генератор открывает собственную сессию: он выполняется уже после
+    выхода из эндпоинта, когда сессия запроса может быть закрыта.
+    Выгрузка читается из реплики, если они настроены.
+    """
+    formatter = format_csv if export_format == "csv" else format_ndjson
+    db = ReadSessionLocal()
+    try:
+        yield from formatter(iter_film_rows(db, batch_size=BATCH_SIZE, **filters))
+    finally:
+        db.close()
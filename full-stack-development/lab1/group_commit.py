@@ -0,0 +1,127 @@
+"""
+Групповой коммит создания фильмов (POST /films)
+
+Каждый POST /films - отдельная транзакция, и при потоке созданий каждый
+запрос платит за свой коммит (fsync журнала SQLite). В режиме группового
+коммита (group_commit_enabled) одновременные запросы собираются в пачку:
+она записывается одной транзакцией (crud.create_films), когда наберется
+group_commit_max_size фильмов или пройдет group_commit_max_delay_ms
+с первого запроса пачки. Пока пачка коммитится, следующие запросы копятся
+в новую. Каждый запрос получает свой фильм с id и created_at из RETURNING.
+
+Ответ отправляется только после коммита пачки, поэтому подтвержденный
+фильм записан так же надежно, как без группировки. Надежность самого коммита
+задает group_commit_synchronous (PRAGMA synchronous на время транзакции
+пачки, только SQLite): fsync один на пачку, поэтому FULL здесь дешевле,
+чем для одиночных записей.
+
+Если транзакция пачки не удалась, фильмы создаются по одному: ошибка
+одного запроса не затрагивает остальные.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from database import SessionLocal, run_db, sqlite_pragmas
+from crud import create_film, create_films
+from models import Film
+from schemas import FilmCreate
+
+logger = logging.getLogger("filmoteka.group_commit")
+
+
+def _set_synchronous(db, value: str) -> None:
+    db.execute(text(f"PRAGMA synchronous={value}"))
+
+
+def commit_batch(session_factory, films: List[FilmCreate], synchronous: Optional[str] = None) -> List[Film]:
+    """Создать пачку фильмов одной транзакцией (synchronous - режим fsync SQLite на время транзакции)"""
+    with session_factory() as db:
+        if synchronous is None or db.get_bind().dialect.name != "sqlite":
+            return create_films(db, films)
+        # Прагма выполняется вне транзакции: sqlite3 начинает ее только перед первой записью
+        _set_synchronous(db, synchronous)
+        try:
+            return create_films(db, films)
+        finally:
+            db.rollback()
+            _set_synchronous(db, sqlite_pragmas().get("synchronous", "FULL"))
+
+
+def _create_one(session_factory, film: FilmCreate) -> Film:
+    with session_factory() as db:
+        return create_film(db, film)
+
+
+class GroupCommitter:
+    """
+    Очередь созданий фильмов, коммитящихся пачками
+
+    Args:
+        max_size: Наибольший размер пачки
+        max_delay: Сколько ждать пополнения пачки после первого запроса, секунды
+        synchronous: PRAGMA synchronous для транзакции пачки (None - как у соединения)
+        session_factory: Фабрика сессий основной БД
+    """
+
+    def __init__(self, max_size: int, max_delay: float, synchronous: Optional[str] = None,
+                 session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self._pending: list[tuple[FilmCreate, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._committing: Optional[asyncio.Task] = None
+
+    async def submit(self, film: FilmCreate) -> Film:
+        """Поставить фильм в пачку и дождаться коммита"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((film, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Пока коммитится предыдущая пачка, запросы копятся (см. _commit)
+        if self._committing is not None or not self._pending:
+            return
+        batch = self._pending[:self.max_size]
+        del self._pending[:self.max_size]
+        self._committing = asyncio.get_running_loop().create_task(self._commit(batch))
+
+    async def _commit(self, batch: list[tuple[FilmCreate, asyncio.Future]]) -> None:
+        try:
+            try:
+                films = await run_db(commit_batch, self.session_factory, [film for film, _ in batch], self.synchronous)
+            except Exception:
+                logger.exception("Не удалось записать пачку из %s фильмов, запись по одному", len(batch))
+                await self._commit_each(batch)
+                return
+            for (_, future), db_film in zip(batch, films):
+                if not future.done():
+                    future.set_result(db_film)
+        finally:
+            self._committing = None
+            # Накопившиеся за время коммита запросы ждали не меньше него: пишутся сразу
+            if self._pending:
+                self._flush()
+
+    async def _commit_each(self, batch: list[tuple[FilmCreate, asyncio.Future]]) -> None:
+        for film, future in batch:
+            try:
+                db_film = await run_db(_create_one, self.session_factory, film)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(db_film)
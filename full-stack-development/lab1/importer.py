@@ -0,0 +1,178 @@
+"""
+Пакетная загрузка фильмов
+
+Записи валидируются пачками схемой FilmCreate и вставляются в БД
+пачками по chunk_size (одна транзакция на пачку, см. crud.create_films_bulk).
+Невалидные записи и записи, которые не удалось вставить, не прерывают
+загрузку, а попадают в список ошибок с номером записи.
+
+Источники: список словарей, JSON-массив, NDJSON (по объекту на строку) и CSV
+с заголовком title,director,year,rating,genre,description.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud import create_films_bulk
+from schemas import FilmCreate
+
+DEFAULT_CHUNK_SIZE = 1000
+# Сколько ошибок хранить подробно; остальные только считаются
+MAX_REPORTED_ERRORS = 1000
+
+_batch_adapter = TypeAdapter(list[FilmCreate])
+
+
+@dataclass
+class ImportResult:
+    """Итог загрузки"""
+    received: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def add_error(self, index: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "error": message})
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class ParseError:
+    """Запись, которую не удалось разобрать; попадает в ошибки вместо валидации"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _format_validation_error(loc: list, message: str) -> str:
+    location = ".".join(str(part) for part in loc)
+    return f"{location}: {message}" if location else message
+
+
+def validate_batch(records: list[Any], start_index: int, result: ImportResult) -> list[tuple[int, dict]]:
+    """
+    Провалидировать пачку записей одним вызовом pydantic
+
+    Возвращает пары (номер записи, данные для вставки); ошибки
+    записываются в result с номером записи в исходном потоке.
+    """
+    messages: dict[int, list[str]] = {}
+    positions = []
+    for position, record in enumerate(records):
+        if isinstance(record, ParseError):
+            messages[position] = [record.message]
+        else:
+            positions.append(position)
+
+    try:
+        films = _batch_adapter.validate_python([records[i] for i in positions])
+    except ValidationError as e:
+        for error in e.errors():
+            candidate, *loc = error["loc"]
+            messages.setdefault(positions[candidate], []).append(_format_validation_error(loc, error["msg"]))
+        # Повторная валидация только прошедших записей (без ошибок)
+        positions = [i for i in positions if i not in messages]
+        films = _batch_adapter.validate_python([records[i] for i in positions])
+
+    for position in sorted(messages):
+        result.add_error(start_index + position, "; ".join(messages[position]))
+    return [(start_index + i, film.model_dump()) for i, film in zip(positions, films)]
+
+
+def insert_batch(db: Session, rows: list[tuple[int, dict]], result: ImportResult) -> None:
+    """
+    Вставить провалидированную пачку одной транзакцией
+
+    Если транзакция пачки падает, записи вставляются по одной,
+    чтобы отделить проблемные записи от остальных.
+    """
+    if not rows:
+        return
+    try:
+        result.inserted += create_films_bulk(db, [data for _, data in rows])
+        return
+    except SQLAlchemyError:
+        db.rollback()
+
+    for index, data in rows:
+        try:
+            result.inserted += create_films_bulk(db, [data])
+        except SQLAlchemyError as e:
+            db.rollback()
+            result.add_error(index, f"Ошибка БД: {e.__class__.__name__}")
+
+
+def process_batch(db: Session, batch: list[Any], result: ImportResult) -> None:
+    """Провалидировать и вставить одну пачку записей, дополнив result"""
+    start_index = result.received
+    result.received += len(batch)
+    insert_batch(db, validate_batch(batch, start_index, result), result)
+
+
+def load_films(
+    db: Session,
+    records: Iterable[Any],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[ImportResult], None]] = None
+) -> ImportResult:
+    """
+    Загрузить поток записей пачками по chunk_size
+
+    Args:
+        db: Сессия БД
+        records: Записи (словари или уже распарсенные объекты JSON)
+        chunk_size: Размер пачки (валидация и одна транзакция вставки)
+        on_progress: Вызывается после каждой пачки с промежуточным итогом
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    batch: list[Any] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) < chunk_size:
+            continue
+        process_batch(db, batch, result)
+        batch = []
+        result.elapsed = time.perf_counter() - started
+        if on_progress is not None:
+            on_progress(result)
+    if batch:
+        process_batch(db, batch, result)
+    result.elapsed = time.perf_counter() - started
+    if batch and on_progress is not None:
+        on_progress(result)
+    return result
+
+
+def parse_ndjson_line(line: Union[str, bytes]) -> Any:
+    """Разобрать строку NDJSON; ошибка разбора возвращается как запись с ошибкой"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ParseError(f"Некорректный JSON: {e}")
+
+
+def iter_ndjson(lines: Iterable[str]) -> Iterator[Any]:
+    """Записи из строк NDJSON (пустые строки пропускаются)"""
+    for line in lines:
+        if line.strip():
+            yield parse_ndjson_line(line)
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[dict]:
+    """Записи из CSV с заголовком; пустое описание считается отсутствующим"""
+    for row in csv.DictReader(lines):
+        if row.get("description") == "":
+            row["description"] = None
+        yield row
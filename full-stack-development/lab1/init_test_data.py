@@ -3,6 +3,7 @@
 """
 from database import init_db, SessionLocal
 from models import Film
+from importer import load_films
 from datetime import datetime
 
 # Тестовые данные
@@ -143,13 +144,9 @@ def init_test_data():
             print(f"В базе уже есть {existing_count} фильмов. Пропускаем инициализацию.")
             return
         
-        # Добавляем тестовые данные
-        for film_data in test_films:
-            film = Film(**film_data)
-            db.add(film)
-        
-        db.commit()
-        print(f"Успешно добавлено {len(test_films)} фильмов в базу данных!")
+        # Добавляем тестовые данные (большие наборы - python manage.py import)
+        result = load_films(db, test_films)
+        print(f"Успешно добавлено {result.inserted} фильмов в базу данных!")
     except Exception as e:
         db.rollback()
         print(f"Ошибка при добавлении данных: {e}")
@@ -0,0 +1,167 @@
+"""
+Сброс кэшей между процессами через журнал изменений films
+
+Кэши cache.py живут в памяти процесса. Когда приложение запущено
+в нескольких процессах (python manage.py serve --workers N) или данные
+меняет другой процесс (python manage.py import), запись сбрасывает кэши
+только у себя. Чтобы остальные процессы узнали о ней:
+- каждая записывающая транзакция crud.py вместе с увеличением версии
+  в change_counters добавляет строку в film_changes (версия и id фильмов);
+- каждый процесс раз в invalidation_poll_interval секунд читает строки
+  с версией больше последней увиденной и вызывает invalidate_films()
+  для чужих изменений (свои он уже сбросил после коммита).
+
+Запись в SQLite упорядочена блокировкой, поэтому версии в журнале идут
+подряд. Если в них пропуск (процесс отстал больше чем на
+invalidation_retention версий, и старые строки удалены), процесс сбрасывает
+кэши целиком. Между записью в одном процессе и сбросом кэшей в другом
+проходит не больше интервала опроса. Применив чужое изменение, процесс,
+как после своей записи (database.mark_write), database_replica_lag секунд
+читает из основной БД, чтобы не закэшировать данные отстающей реплики.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from cache import film_cache, film_key, films_generation, invalidate_films
+from config import settings
+from database import mark_write
+from models import FilmChange
+
+logger = logging.getLogger("filmoteka.invalidation")
+
+# Больше стольких id в строку журнала не пишется: такие записи сбрасывают все карточки
+MAX_LOGGED_IDS = 1000
+# Старые строки журнала удаляются раз в столько версий
+PRUNE_EVERY = 100
+
+_last_seen = 0
+# Версии, записанные этим процессом и еще не встреченные при опросе
+_local_versions: set[int] = set()
+_lock = Lock()
+
+
+def publish(db: Session, version: int, changed_at: Optional[datetime], film_ids=()) -> None:
+    """Добавить изменение в журнал в текущей транзакции (до коммита)"""
+    film_ids = list(film_ids)
+    db.execute(insert(FilmChange).values(
+        version=version,
+        film_ids=json.dumps(film_ids) if len(film_ids) <= MAX_LOGGED_IDS else None,
+        changed_at=changed_at,
+    ))
+    if version % PRUNE_EVERY == 0:
+        db.execute(delete(FilmChange).where(FilmChange.version <= version - settings.invalidation_retention))
+
+
+def note_local(version: int) -> None:
+    """Отметить версию как записанную этим процессом (ее кэши уже сброшены)"""
+    with _lock:
+        if version > _last_seen:
+            _local_versions.add(version)
+
+
+def reset(version: int) -> None:
+    """Начать опрос с версии version (при загрузке версии данных из БД)"""
+    global _last_seen
+    with _lock:
+        _last_seen = version
+        _local_versions.clear()
+
+
+def poll(db: Session) -> int:
+    """
+    Сбросить кэши по чужим изменениям, записанным после последнего опроса
+
+    Returns:
+        Число обработанных чужих изменений
+    """
+    global _last_seen
+    with _lock:
+        last_seen = _last_seen
+    rows = db.execute(
+        select(FilmChange.version, FilmChange.film_ids, FilmChange.changed_at)
+        .where(FilmChange.version > last_seen)
+        .order_by(FilmChange.version)
+    ).all()
+    if not rows:
+        return 0
+
+    newest = rows[-1].version
+    with _lock:
+        local = {version for version in _local_versions if version <= newest}
+        _local_versions.difference_update(local)
+        _last_seen = max(_last_seen, newest)
+    if any(row.version not in local for row in rows):
+        # Как после своей записи: пока реплики могут отставать от чужой записи,
+        # кэши заполняются чтениями из основной БД
+        mark_write()
+
+    contiguous = rows[0].version == last_seen + 1 and rows[-1].version - rows[0].version == len(rows) - 1
+    if not contiguous:
+        logger.warning("Пропуск в журнале изменений после версии %s: кэши сбрасываются целиком", last_seen)
+        film_cache.clear()
+        invalidate_films((), newest, rows[-1].changed_at)
+        return sum(row.version not in local for row in rows)
+
+    applied = 0
+    for row in rows:
+        if row.version in local:
+            continue
+        if row.film_ids is None:
+            film_cache.clear()
+            film_ids = ()
+        else:
+            film_ids = json.loads(row.film_ids)
+        if row.version <= films_generation():
+            # Поколение уже не ниже этой версии (процесс успел записать позже):
+            # списки закэшированы после нее, устареть могли только карточки
+            for film_id in film_ids:
+                film_cache.delete(film_key(film_id))
+        else:
+            invalidate_films(film_ids, row.version, row.changed_at)
+        applied += 1
+    return applied
+
+
+async def _listen(interval: float) -> None:
+    from database import SessionLocal, run_db
+
+    def poll_primary() -> int:
+        with SessionLocal() as db:
+            return poll(db)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_db(poll_primary)
+        except Exception:
+            logger.exception("Не удалось прочитать журнал изменений films")
+
+
+_listener: Optional[asyncio.Task] = None
+
+
+def start_listener(interval: float) -> None:
+    """Запустить опрос журнала в текущем event loop (interval <= 0 - не запускать)"""
+    global _listener
+    if interval > 0 and _listener is None:
+        _listener = asyncio.get_running_loop().create_task(_listen(interval))
+
+
+async def stop_listener() -> None:
+    """Остановить опрос журнала"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
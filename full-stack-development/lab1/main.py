@@ -1,26 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, Response
 from sqlalchemy.orm import Session
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Union
 from math import ceil
+import json
 
-from database import get_db, init_db
+from config import settings
+from compression import CompressionMiddleware
+from database import engine, replica_engines, get_db, get_read_db, check_db, init_db, run_db
+from cache import cache_stats, films_generation, films_last_modified
+import conditional
+import importer
+from group_commit import GroupCommitter
+import invalidation
+import export
+import metrics
+import profiler
+from serialization import film_list_response, parse_fields
 from models import Film
 from schemas import (
     FilmCreate, 
     FilmUpdate, 
     FilmResponse, 
     FilmListResponse,
-    FilmStatsResponse
+    FilmCursorListResponse,
+    FilmBulkResponse,
+    FilmBulkChangeResponse,
+    FilmStatsResponse,
+    FilmFacetsResponse,
+    FilmBatchGetRequest,
+    FilmBatchGetResponse,
+    BULK_CHANGE_MAX_IDS
 )
 from crud import (
-    get_film,
+    get_film_card,
+    get_film_cards,
+    project_card,
     get_films,
+    get_films_keyset,
+    get_film_facets,
     create_film,
     update_film,
     delete_film,
+    update_films_bulk,
+    delete_films_bulk,
     search_films_by_title,
+    search_films_by_title_keyset,
     get_film_stats
 )
 
@@ -42,11 +69,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие ответов (см. compression.py)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+        excluded_types=settings.compression_excluded_types,
+    )
+
+# Метрики запросов и БД (см. metrics.py); middleware - внешний, чтобы учесть сжатие
+if settings.metrics_enabled:
+    for db_engine in [engine, *replica_engines]:
+        metrics.install_query_hooks(db_engine, settings.slow_query_ms)
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=settings.metrics_server_timing)
+
+# Групповой коммит POST /films (см. group_commit.py)
+group_committer = GroupCommitter(
+    max_size=settings.group_commit_max_size,
+    max_delay=settings.group_commit_max_delay_ms / 1000,
+    synchronous=settings.group_commit_synchronous,
+) if settings.group_commit_enabled else None
+
+# Профилирование отдельного запроса по заголовку X-Profile (см. profiler.py)
+if settings.admin_token:
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+
+def _count_pages(total: Optional[int], size: int) -> Optional[int]:
+    """Число страниц по общему количеству (None, если total не считался)"""
+    if total is None:
+        return None
+    return ceil(total / size) if total > 0 else 1
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """Разобрать параметр fields; неизвестное поле - ошибка 400"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+FIELDS_DESCRIPTION = "Поля фильма в ответе через запятую (например, id,title,year,rating); по умолчанию - все"
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Инициализация БД при старте приложения"""
-    init_db()
+    """Проверка версии схемы БД при старте приложения (миграции - python manage.py migrate)"""
+    await run_db(init_db if settings.db_auto_migrate else check_db)
+    invalidation.start_listener(settings.invalidation_poll_interval)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка опроса журнала изменений films"""
+    await invalidation.stop_listener()
 
 
 @app.get("/", tags=["Информация"])
@@ -61,13 +140,15 @@ async def root():
             "films": "/films",
             "film_by_id": "/films/{id}",
             "search": "/films/search/{query}",
+            "facets": "/films/facets",
             "stats": "/films/stats"
         }
     }
 
 
-@app.get("/films", response_model=FilmListResponse, tags=["Фильмы"])
+@app.get("/films", response_model=Union[FilmListResponse, FilmCursorListResponse], tags=["Фильмы"])
 async def read_films(
+    request: Request,
     page: int = Query(1, ge=1, description="Номер страницы"),
     size: int = Query(10, ge=1, le=100, description="Размер страницы"),
     year_min: Optional[int] = Query(None, ge=1888, description="Минимальный год"),
@@ -75,9 +156,15 @@ async def read_films(
     rating_min: Optional[float] = Query(None, ge=0.0, le=10.0, description="Минимальный рейтинг"),
     rating_max: Optional[float] = Query(None, ge=0.0, le=10.0, description="Максимальный рейтинг"),
     genre: Optional[str] = Query(None, description="Жанр (поиск по подстроке)"),
+    genre_exact: bool = Query(False, description="Искать жанр целиком, без учета регистра"),
+    genre_id: Optional[List[int]] = Query(None, description="id жанров из справочника (любой из них)"),
+    director_id: Optional[int] = Query(None, description="id режиссера из справочника"),
     sort_by: str = Query("id", description="Поле для сортировки (id, title, year, rating, created_at)"),
     sort_order: str = Query("asc", regex="^(asc|desc)$", description="Порядок сортировки (asc/desc)"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор keyset-пагинации (пустая строка - первая страница)"),
+    include_total: bool = Query(True, description="Считать общее количество (total/pages)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
 ):
     """
     Получить список фильмов с пагинацией, фильтрацией и сортировкой
@@ -87,11 +174,53 @@ async def read_films(
     - **year_min/year_max**: Фильтр по году
     - **rating_min/rating_max**: Фильтр по рейтингу
     - **genre**: Поиск по жанру
+    - **genre_exact**: true - жанр должен совпасть целиком (быстрый поиск по индексу)
+    - **genre_id**: Фильтр по справочнику жанров (можно несколько: ?genre_id=1&genre_id=2)
+    - **director_id**: Фильтр по справочнику режиссеров
     - **sort_by**: Поле для сортировки
     - **sort_order**: Порядок сортировки (asc/desc)
+    - **cursor**: Если передан, включается keyset-пагинация: page игнорируется,
+      а ответ содержит next_cursor для следующей страницы вместо total/pages
+    - **include_total**: false - не считать total/pages (экономит запрос COUNT)
+    - **fields**: Только перечисленные поля фильмов (остальные колонки не читаются из БД)
+    
+    Ответ содержит ETag и Last-Modified; при совпадении If-None-Match
+    (или If-Modified-Since) возвращается 304 без обращения к БД.
     """
+    fields = _parse_fields(fields)
+    # Версия снимается до чтения: ETag может оказаться старше данных, но не новее
+    etag = conditional.version_etag("films", films_generation(), request)
+    last_modified = films_last_modified()
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    headers = conditional.validator_headers(etag, last_modified)
+    
+    if cursor is not None:
+        try:
+            films, next_cursor = await run_db(
+                get_films_keyset,
+                db=db,
+                cursor=cursor,
+                limit=size,
+                year_min=year_min,
+                year_max=year_max,
+                rating_min=rating_min,
+                rating_max=rating_max,
+                genre=genre,
+                genre_exact=genre_exact,
+                genre_ids=genre_id,
+                director_id=director_id,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                fields=fields
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return film_list_response(films, headers, fields, size=size, next_cursor=next_cursor)
+    
     skip = (page - 1) * size
-    films, total = get_films(
+    films, total = await run_db(
+        get_films,
         db=db,
         skip=skip,
         limit=size,
@@ -100,32 +229,129 @@ async def read_films(
         rating_min=rating_min,
         rating_max=rating_max,
         genre=genre,
+        genre_exact=genre_exact,
+        genre_ids=genre_id,
+        director_id=director_id,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        include_total=include_total,
+        fields=fields
+    )
+    
+    pages = _count_pages(total, size)
+    
+    return film_list_response(films, headers, fields, total=total, page=page, size=size, pages=pages)
+
+
+@app.get("/films/export", tags=["Фильмы"])
+async def export_films(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="Формат выгрузки (ndjson, csv)"),
+    year_min: Optional[int] = Query(None, ge=1888, description="Минимальный год"),
+    year_max: Optional[int] = Query(None, le=2100, description="Максимальный год"),
+    rating_min: Optional[float] = Query(None, ge=0.0, le=10.0, description="Минимальный рейтинг"),
+    rating_max: Optional[float] = Query(None, ge=0.0, le=10.0, description="Максимальный рейтинг"),
+    genre: Optional[str] = Query(None, description="Жанр (поиск по подстроке)"),
+    genre_exact: bool = Query(False, description="Искать жанр целиком, без учета регистра"),
+    genre_id: Optional[List[int]] = Query(None, description="id жанров из справочника (любой из них)"),
+    director_id: Optional[int] = Query(None, description="id режиссера из справочника"),
+    sort_by: str = Query("id", description="Поле для сортировки (id, title, year, rating, created_at)"),
+    sort_order: str = Query("asc", regex="^(asc|desc)$", description="Порядок сортировки (asc/desc)")
+):
+    """
+    Потоковая выгрузка всех фильмов, подходящих под фильтры
+    
+    Принимает те же фильтры и сортировку, что и GET /films, но без пагинации.
+    Ответ отдается потоком (NDJSON - по объекту на строку, CSV - с заголовком),
+    память сервера не зависит от размера выгрузки.
+    """
+    rows = export.stream_export(
+        format,
+        year_min=year_min,
+        year_max=year_max,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        genre=genre,
+        genre_exact=genre_exact,
+        genre_ids=genre_id,
+        director_id=director_id,
         sort_by=sort_by,
         sort_order=sort_order
     )
+    return StreamingResponse(
+        rows,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="films.{format}"'}
+    )
+
+
+@app.get("/films/facets", response_model=FilmFacetsResponse, tags=["Фильмы"])
+async def read_film_facets(
+    request: Request,
+    response: Response,
+    year_min: Optional[int] = Query(None, ge=1888, description="Минимальный год"),
+    year_max: Optional[int] = Query(None, le=2100, description="Максимальный год"),
+    rating_min: Optional[float] = Query(None, ge=0.0, le=10.0, description="Минимальный рейтинг"),
+    rating_max: Optional[float] = Query(None, ge=0.0, le=10.0, description="Максимальный рейтинг"),
+    genre: Optional[str] = Query(None, description="Жанр (поиск по подстроке)"),
+    genre_exact: bool = Query(False, description="Искать жанр целиком, без учета регистра"),
+    genre_id: Optional[List[int]] = Query(None, description="id жанров из справочника (любой из них)"),
+    director_id: Optional[int] = Query(None, description="id режиссера из справочника"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Фасеты для фильтров списка фильмов
     
-    pages = ceil(total / size) if total > 0 else 1
+    Принимает те же фильтры, что и GET /films, и одним запросом возвращает
+    число подходящих фильмов по жанрам (с id для фильтра genre_id),
+    десятилетиям и интервалам рейтинга шириной 1.
+    """
+    etag = conditional.version_etag("facets", films_generation(), request)
+    last_modified = films_last_modified()
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    response.headers.update(conditional.validator_headers(etag, last_modified))
     
-    return FilmListResponse(
-        items=films,
-        total=total,
-        page=page,
-        size=size,
-        pages=pages
+    return await run_db(
+        get_film_facets,
+        db=db,
+        year_min=year_min,
+        year_max=year_max,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        genre=genre,
+        genre_exact=genre_exact,
+        genre_ids=genre_id,
+        director_id=director_id
     )
 
 
 @app.get("/films/{film_id}", response_model=FilmResponse, tags=["Фильмы"])
-async def read_film(film_id: int, db: Session = Depends(get_db)):
+async def read_film(
+    film_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
+):
     """
     Получить фильм по ID
     
     - **film_id**: ID фильма
+    - **fields**: Только перечисленные поля (карточка берется из кэша и урезается)
+    
+    Поддерживает условные запросы (If-None-Match / If-Modified-Since -> 304).
     """
-    film = get_film(db, film_id=film_id)
-    if film is None:
+    fields = _parse_fields(fields)
+    card = await run_db(get_film_card, db, film_id=film_id)
+    if card is None:
         raise HTTPException(status_code=404, detail=f"Фильм с ID {film_id} не найден")
-    return film
+    card = project_card(card, fields)
+    if conditional.is_not_modified(request, card.etag, card.last_modified):
+        return conditional.not_modified(card.etag, card.last_modified)
+    return Response(
+        content=card.content,
+        media_type="application/json",
+        headers=conditional.validator_headers(card.etag, card.last_modified)
+    )
 
 
 @app.post("/films", response_model=FilmResponse, status_code=201, tags=["Фильмы"])
@@ -140,7 +366,148 @@ async def create_new_film(film: FilmCreate, db: Session = Depends(get_db)):
     - **genre**: Жанр (обязательно, 1-50 символов)
     - **description**: Описание (опционально, до 1000 символов)
     """
-    return create_film(db=db, film=film)
+    if group_committer is not None:
+        return await group_committer.submit(film)
+    return await run_db(create_film, db=db, film=film)
+
+
+async def _iter_request_batches(request: Request, chunk_size: int):
+    """Пачки записей из тела запроса: JSON-массив целиком или NDJSON потоком"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" not in content_type and "jsonl" not in content_type:
+        try:
+            records = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Тело запроса должно быть JSON-массивом фильмов")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Тело запроса должно быть JSON-массивом фильмов")
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
+        return
+    
+    batch = []
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                batch.append(importer.parse_ndjson_line(line))
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if buffer.strip():
+        batch.append(importer.parse_ndjson_line(buffer))
+    if batch:
+        yield batch
+
+
+@app.post("/films/bulk", response_model=FilmBulkResponse, tags=["Фильмы"])
+async def create_films_in_bulk(
+    request: Request,
+    chunk_size: int = Query(importer.DEFAULT_CHUNK_SIZE, ge=1, le=10000, description="Размер пачки вставки"),
+    db: Session = Depends(get_db)
+):
+    """
+    Пакетная загрузка фильмов
+    
+    Тело - JSON-массив объектов FilmCreate или NDJSON (Content-Type: application/x-ndjson,
+    по объекту на строку; читается потоком). Записи валидируются и вставляются пачками
+    по **chunk_size**, по одной транзакции на пачку. Невалидные записи не прерывают
+    загрузку и возвращаются в **errors** с номером записи.
+    """
+    result = importer.ImportResult()
+    async for batch in _iter_request_batches(request, chunk_size):
+        await run_db(importer.process_batch, db, batch, result)
+    return FilmBulkResponse(
+        received=result.received,
+        inserted=result.inserted,
+        failed=result.failed,
+        errors=result.errors
+    )
+
+
+@app.post("/films/batch-get", response_model=FilmBatchGetResponse, tags=["Фильмы"])
+async def read_films_batch(request: FilmBatchGetRequest, db: Session = Depends(get_read_db)):
+    """
+    Получить несколько фильмов по id одним запросом
+    
+    - **ids**: id фильмов (не больше 100)
+    
+    Фильмы возвращаются в порядке ids (повторы отбрасываются), id
+    ненайденных фильмов - в **missing**. Карточки берутся из кэша,
+    остальные читаются одним запросом к БД.
+    """
+    cards, missing = await run_db(get_film_cards, db, film_ids=request.ids)
+    content = b'{"items":[' + b",".join(card.content for card in cards) + b'],"missing":' + \
+        json.dumps(missing).encode() + b"}"
+    return Response(content=content, media_type="application/json")
+
+
+def _bulk_selection(
+    id: Optional[List[int]] = Query(None, description="id фильмов"),
+    year_min: Optional[int] = Query(None, ge=1888, description="Минимальный год"),
+    year_max: Optional[int] = Query(None, le=2100, description="Максимальный год"),
+    rating_min: Optional[float] = Query(None, ge=0.0, le=10.0, description="Минимальный рейтинг"),
+    rating_max: Optional[float] = Query(None, ge=0.0, le=10.0, description="Максимальный рейтинг"),
+    genre: Optional[str] = Query(None, description="Жанр (поиск по подстроке)"),
+    genre_exact: bool = Query(False, description="Искать жанр целиком, без учета регистра"),
+    genre_id: Optional[List[int]] = Query(None, description="id жанров из справочника (любой из них)"),
+    director_id: Optional[int] = Query(None, description="id режиссера из справочника")
+) -> dict:
+    """Набор фильмов для PATCH/DELETE /films/bulk: id и/или фильтры GET /films"""
+    if id and len(id) > BULK_CHANGE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {BULK_CHANGE_MAX_IDS} id в одном запросе")
+    filters = {
+        "year_min": year_min,
+        "year_max": year_max,
+        "rating_min": rating_min,
+        "rating_max": rating_max,
+        "genre": genre,
+        "genre_ids": genre_id,
+        "director_id": director_id
+    }
+    # Без id и фильтров запрос затронул бы всю таблицу
+    if not id and all(value in (None, "") for value in filters.values()):
+        raise HTTPException(status_code=400, detail="Укажите id фильмов или хотя бы один фильтр")
+    return {"film_ids": id, "genre_exact": genre_exact, **filters}
+
+
+@app.patch("/films/bulk", response_model=FilmBulkChangeResponse, tags=["Фильмы"])
+async def update_films_in_bulk(
+    film: FilmUpdate,
+    selection: dict = Depends(_bulk_selection),
+    db: Session = Depends(get_db)
+):
+    """
+    Изменить поля у набора фильмов
+    
+    Фильмы выбираются по **id** и/или тем же фильтрам, что в GET /films
+    (условия объединяются через И). Тело - FilmUpdate: передаются только
+    изменяемые поля. Изменение выполняется одним UPDATE в одной транзакции;
+    возвращается число измененных фильмов.
+    """
+    changes = film.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Не переданы изменяемые поля")
+    affected = await run_db(update_films_bulk, db, changes, **selection)
+    return FilmBulkChangeResponse(affected=affected)
+
+
+@app.delete("/films/bulk", response_model=FilmBulkChangeResponse, tags=["Фильмы"])
+async def delete_films_in_bulk(
+    selection: dict = Depends(_bulk_selection),
+    db: Session = Depends(get_db)
+):
+    """
+    Удалить набор фильмов
+    
+    Фильмы выбираются по **id** и/или тем же фильтрам, что в GET /films
+    (условия объединяются через И). Удаление выполняется одним DELETE
+    в одной транзакции; возвращается число удаленных фильмов.
+    """
+    affected = await run_db(delete_films_bulk, db, **selection)
+    return FilmBulkChangeResponse(affected=affected)
 
 
 @app.put("/films/{film_id}", response_model=FilmResponse, tags=["Фильмы"])
@@ -155,7 +522,7 @@ async def update_existing_film(
     - **film_id**: ID фильма
     - Все поля опциональны - обновляются только переданные поля
     """
-    db_film = update_film(db=db, film_id=film_id, film=film)
+    db_film = await run_db(update_film, db=db, film_id=film_id, film=film)
     if db_film is None:
         raise HTTPException(status_code=404, detail=f"Фильм с ID {film_id} не найден")
     return db_film
@@ -168,42 +535,65 @@ async def delete_existing_film(film_id: int, db: Session = Depends(get_db)):
     
     - **film_id**: ID фильма
     """
-    success = delete_film(db=db, film_id=film_id)
+    success = await run_db(delete_film, db=db, film_id=film_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"Фильм с ID {film_id} не найден")
     return JSONResponse(status_code=204, content=None)
 
 
-@app.get("/films/search/{query}", response_model=FilmListResponse, tags=["Поиск"])
+@app.get("/films/search/{query}", response_model=Union[FilmListResponse, FilmCursorListResponse], tags=["Поиск"])
 async def search_films(
+    request: Request,
     query: str,
     page: int = Query(1, ge=1, description="Номер страницы"),
     size: int = Query(10, ge=1, le=100, description="Размер страницы"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор keyset-пагинации (пустая строка - первая страница)"),
+    include_total: bool = Query(True, description="Считать общее количество (total/pages)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_read_db)
 ):
     """
-    Поиск фильмов по названию
+    Полнотекстовый поиск фильмов по названию, режиссеру и описанию
     
-    - **query**: Поисковый запрос (ищется подстрока в названии)
+    - **query**: Поисковый запрос (слова ищутся как префиксы без учета регистра,
+      результаты отсортированы по релевантности)
     - **page**: Номер страницы
     - **size**: Размер страницы
+    - **cursor**: Keyset-пагинация, как в GET /films
+    - **include_total**: false - не считать total/pages
+    - **fields**: Только перечисленные поля фильмов, как в GET /films
+    
+    Поддерживает условные запросы, как GET /films.
     """
-    skip = (page - 1) * size
-    films, total = search_films_by_title(db=db, title_query=query, skip=skip, limit=size)
+    fields = _parse_fields(fields)
+    etag = conditional.version_etag("search", films_generation(), request)
+    last_modified = films_last_modified()
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    headers = conditional.validator_headers(etag, last_modified)
     
-    pages = ceil(total / size) if total > 0 else 1
+    if cursor is not None:
+        try:
+            films, next_cursor = await run_db(
+                search_films_by_title_keyset, db=db, title_query=query, cursor=cursor, limit=size, fields=fields
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return film_list_response(films, headers, fields, size=size, next_cursor=next_cursor)
     
-    return FilmListResponse(
-        items=films,
-        total=total,
-        page=page,
-        size=size,
-        pages=pages
+    skip = (page - 1) * size
+    films, total = await run_db(
+        search_films_by_title, db=db, title_query=query, skip=skip, limit=size, include_total=include_total,
+        fields=fields
     )
+    
+    pages = _count_pages(total, size)
+    
+    return film_list_response(films, headers, fields, total=total, page=page, size=size, pages=pages)
 
 
 @app.get("/films/stats/overview", response_model=FilmStatsResponse, tags=["Статистика"])
-async def get_statistics(db: Session = Depends(get_db)):
+async def get_statistics(request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     Получить статистику по фильмотеке
     
@@ -212,12 +602,69 @@ async def get_statistics(db: Session = Depends(get_db)):
     - Средний, минимальный и максимальный рейтинг
     - Распределение фильмов по годам
     - Распределение фильмов по жанрам
+    
+    Поддерживает условные запросы (ETag по версии данных -> 304).
     """
-    stats = get_film_stats(db=db)
+    etag = conditional.version_etag("stats", films_generation(), request)
+    last_modified = films_last_modified()
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    response.headers.update(conditional.validator_headers(etag, last_modified))
+    
+    stats = await run_db(get_film_stats, db=db)
     return stats
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Служебное"])
+async def get_metrics():
+    """
+    Метрики в формате Prometheus: время и число HTTP-запросов по маршрутам,
+    запросы к БД на HTTP-запрос, время запросов к БД, медленные запросы, кэши
+    
+    Доступны, если включена настройка metrics_enabled (FILMOTEKA_METRICS_ENABLED=1).
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Метрики выключены (FILMOTEKA_METRICS_ENABLED)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/admin/profile", response_class=PlainTextResponse, tags=["Служебное"])
+async def profile_process(
+    seconds: float = Query(5.0, gt=0, description="Длительность сэмплирования, секунд"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="Интервал сэмплов, мс"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Статистический профиль всего процесса за **seconds** секунд
+    
+    Возвращает свернутые стеки (формат flamegraph.pl / speedscope): строка
+    на стек с числом сэмплов. Требует заголовок X-Admin-Token (настройка admin_token);
+    длительность ограничена настройкой profiler_max_seconds.
+    """
+    if not profiler.check_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Нужен X-Admin-Token")
+    interval = (interval_ms or settings.profiler_interval_ms) / 1000
+    try:
+        sampler = await run_in_threadpool(profiler.sample_for, seconds, interval)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Profile-Samples": str(sampler.samples)})
+
+
+@app.get("/cache/stats", tags=["Служебное"])
+async def get_cache_stats():
+    """
+    Счетчики кэшей: попадания, промахи, вытеснения и размер
+    
+    - **film**: кэш карточек фильмов (GET /films/{id})
+    - **count**: кэш общего количества для списков
+    - **list**: кэш страниц GET /films
+    """
+    return cache_stats()
+
+
 if __name__ == "__main__":
     import uvicorn
+    # Несколько процессов: python manage.py serve --workers N
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
@@ -0,0 +1,287 @@
+"""
+Служебные команды Filmoteka
+
+Запуск из папки lab1:
+    python manage.py check-stats [--fix]
+    python manage.py import films.ndjson [--format ndjson|csv|json] [--chunk-size 5000]
+    python manage.py explain [--strict]
+    python manage.py migrate [--target N] [--status]
+    python manage.py serve [--workers N] [--preload] [--graceful-timeout 30] [--max-requests 0]
+
+serve запускает API в нескольких процессах. Если установлен gunicorn, он
+управляет воркерами uvicorn: --preload импортирует приложение до fork,
+kill -HUP <pid мастера> перезапускает воркеров по одному без потери
+запросов, --max-requests перезапускает воркера после N запросов.
+Без gunicorn используется менеджер процессов uvicorn (без --preload
+и перезапуска по HUP). Кэши каждого процесса согласуются через журнал
+изменений films (см. invalidation.py).
+"""
+import argparse
+import json
+import os
+import sys
+
+from config import settings
+from database import SessionLocal, engine, init_db, replica_engines
+from crud import SORT_COLUMNS, films_query
+import importer
+import migrations
+import stats
+
+# Типичные комбинации фильтров GET /films для explain
+EXPLAIN_FILTERS = {
+    "без фильтров": {},
+    "годы": {"year_min": 1990, "year_max": 2000},
+    "рейтинг": {"rating_min": 8.0},
+    "годы+рейтинг": {"year_min": 1990, "year_max": 2000, "rating_min": 8.0},
+    "жанр~": {"genre": "драма"},
+    "жанр=": {"genre": "драма", "genre_exact": True},
+    "жанр=+годы": {"genre": "драма", "genre_exact": True, "year_min": 1990, "year_max": 2000},
+    "жанр=+рейтинг": {"genre": "драма", "genre_exact": True, "rating_min": 8.0},
+}
+
+
+def check_stats_command(args) -> int:
+    """Сверить материализованную статистику с пересчетом с нуля"""
+    init_db()
+    with SessionLocal() as db:
+        diff = stats.check_stats(db)
+        if not diff:
+            print("Статистика согласована")
+            return 0
+        print("Найдены расхождения (материализованное -> пересчитанное):")
+        for field, (stored, actual) in diff.items():
+            print(f"  {field}: {stored} -> {actual}")
+        if args.fix:
+            stats.rebuild_stats(db)
+            db.commit()
+            print("Статистика пересчитана")
+            return 0
+        return 1
+
+
+def _print_progress(result: importer.ImportResult) -> None:
+    print(
+        f"\rобработано {result.received}, вставлено {result.inserted}, ошибок {result.failed}"
+        f" ({result.rows_per_second:.0f} строк/с)",
+        end="", file=sys.stderr, flush=True
+    )
+
+
+def import_command(args) -> int:
+    """Загрузить фильмы из файла CSV, NDJSON или JSON-массива"""
+    file_format = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if file_format == "jsonl":
+        file_format = "ndjson"
+    if file_format not in ("csv", "ndjson", "json"):
+        print(f"Неизвестный формат файла: {file_format!r} (укажите --format)", file=sys.stderr)
+        return 2
+
+    init_db()
+    with open(args.path, encoding="utf-8-sig", newline="") as f, SessionLocal() as db:
+        if file_format == "csv":
+            records = importer.iter_csv(f)
+        elif file_format == "ndjson":
+            records = importer.iter_ndjson(f)
+        else:
+            records = json.load(f)
+        result = importer.load_films(db, records, chunk_size=args.chunk_size, on_progress=_print_progress)
+    print(file=sys.stderr)
+
+    print(f"Обработано записей: {result.received}")
+    print(f"Вставлено: {result.inserted} за {result.elapsed:.1f} с ({result.rows_per_second:.0f} строк/с)")
+    print(f"Ошибок: {result.failed}")
+    for error in result.errors[:args.show_errors]:
+        print(f"  запись {error['index']}: {error['error']}")
+    return 0 if result.failed == 0 else 1
+
+
+def _range_search(plan: list[str]) -> bool:
+    """План выбирает строки поиском диапазона по индексу (year>? AND year<? и т.п.)"""
+    return any(detail.startswith("SEARCH ") and (">?" in detail or "<?" in detail) for detail in plan)
+
+
+def _plan_problems(plan: list[str], sort_by: str, filters: dict) -> list[str]:
+    """
+    Проблемы плана запроса: скан таблицы и сортировка во временном B-дереве
+
+    Без фильтров скан в порядке сортировки (по индексу колонки или, для id,
+    по первичному ключу) не проблема: он останавливается на LIMIT. С фильтрами
+    любой скан, в том числе по индексу, проверяет строки подряд и при редких
+    совпадениях читает почти всю таблицу.
+
+    Сортировка после поиска диапазона по индексу не считается проблемой:
+    сортируются только строки диапазона, а индекс сразу и по диапазону одной
+    колонки, и по порядку другой невозможен (допустимые планы помечаются "~").
+    """
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN "):
+            if filters:
+                problems.append("скан с фильтрацией строк")
+            elif " USING " not in detail and sort_by != "id":
+                problems.append("полный скан")
+        if "USE TEMP B-TREE" in detail and not _range_search(plan):
+            problems.append("сортировка во временном B-дереве")
+    return problems
+
+
+def explain_command(args) -> int:
+    """Показать EXPLAIN QUERY PLAN для комбинаций фильтров и сортировок get_films"""
+    init_db()
+    if engine.dialect.name != "sqlite":
+        print("explain поддерживается только для SQLite", file=sys.stderr)
+        return 2
+    flagged = 0
+    with engine.connect() as conn:
+        if args.analyze:
+            conn.exec_driver_sql("ANALYZE")
+        for filter_name, filters in EXPLAIN_FILTERS.items():
+            for sort_by in SORT_COLUMNS:
+                query = films_query(sort_by=sort_by, sort_order=args.order, **filters).limit(args.limit)
+                sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+                plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+                problems = _plan_problems(plan, sort_by, filters)
+                flagged += bool(problems)
+                accepted = any("USE TEMP B-TREE" in detail for detail in plan)
+                mark = "!!" if problems else "~ " if accepted else "ok"
+                print(f"{mark}  {filter_name:<15} {sort_by:<11} {'; '.join(plan)}")
+                if problems:
+                    print(f"    -> {', '.join(problems)}")
+    print(f"Комбинаций с проблемами: {flagged}")
+    return 1 if flagged and args.strict else 0
+
+
+def migrate_command(args) -> int:
+    """Применить миграции схемы БД или показать их состояние"""
+    if args.status:
+        with engine.connect() as conn:
+            version = migrations.current_version(conn) or 0
+        for migration in migrations.MIGRATIONS:
+            mark = "x" if migration.version <= version else " "
+            print(f"[{mark}] {migration.version:>3} {migration.name}")
+        return 0 if version >= migrations.LATEST_VERSION else 1
+
+    def on_step(migration):
+        print(f"Применяется {migration.version}: {migration.name}...", flush=True)
+
+    applied = migrations.migrate(engine, target=args.target, on_step=on_step)
+    with engine.connect() as conn:
+        version = migrations.current_version(conn)
+    if applied:
+        print(f"Применено миграций: {len(applied)}, версия схемы: {version}")
+    else:
+        print(f"Схема актуальна, версия: {version}")
+    return 0
+
+
+def _dispose_engines() -> None:
+    """Закрыть соединения, открытые до fork: процессы-воркеры откроют свои"""
+    for bind in (engine, *replica_engines):
+        bind.dispose()
+
+
+def _serve_gunicorn(args, workers: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class FilmotekaApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", args.preload)
+            self.cfg.set("graceful_timeout", args.graceful_timeout)
+            self.cfg.set("max_requests", args.max_requests)
+            self.cfg.set("max_requests_jitter", args.max_requests // 10)
+            self.cfg.set("post_fork", lambda server, worker: _dispose_engines())
+
+        def load(self):
+            from main import app
+            return app
+
+    FilmotekaApplication().run()
+
+
+def serve_command(args) -> int:
+    """Запустить API в нескольких процессах"""
+    workers = args.workers or os.cpu_count() or 1
+    # Схема проверяется один раз до запуска воркеров (каждый при старте сверит ее снова)
+    migrations.check_schema(engine)
+    _dispose_engines()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+    if gunicorn is not None:
+        _serve_gunicorn(args, workers)
+        return 0
+
+    import uvicorn
+    if args.preload:
+        print("gunicorn не установлен: --preload не поддерживается, воркеры импортируют приложение сами",
+              file=sys.stderr)
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+    )
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Служебные команды Filmoteka")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check_stats_parser = commands.add_parser(
+        "check-stats", help="Сверить материализованную статистику с пересчетом с нуля"
+    )
+    check_stats_parser.add_argument("--fix", action="store_true", help="Пересчитать статистику при расхождении")
+    check_stats_parser.set_defaults(handler=check_stats_command)
+
+    import_parser = commands.add_parser("import", help="Загрузить фильмы из файла CSV, NDJSON или JSON")
+    import_parser.add_argument("path", help="Путь к файлу")
+    import_parser.add_argument("--format", choices=["csv", "ndjson", "json"],
+                               help="Формат файла (по умолчанию - по расширению)")
+    import_parser.add_argument("--chunk-size", type=int, default=importer.DEFAULT_CHUNK_SIZE,
+                               help="Размер пачки (одна транзакция на пачку)")
+    import_parser.add_argument("--show-errors", type=int, default=20, help="Сколько ошибок вывести")
+    import_parser.set_defaults(handler=import_command)
+
+    explain_parser = commands.add_parser(
+        "explain", help="Проверить планы запросов списка фильмов (полные сканы и сортировки)"
+    )
+    explain_parser.add_argument("--order", choices=["asc", "desc"], default="asc", help="Порядок сортировки")
+    explain_parser.add_argument("--limit", type=int, default=10, help="Размер страницы в запросе")
+    explain_parser.add_argument("--analyze", action="store_true",
+                                help="Сначала собрать статистику планировщика (ANALYZE)")
+    explain_parser.add_argument("--strict", action="store_true", help="Код возврата 1, если есть проблемы")
+    explain_parser.set_defaults(handler=explain_command)
+
+    migrate_parser = commands.add_parser("migrate", help="Применить миграции схемы БД")
+    migrate_parser.add_argument("--target", type=int, help="Версия, до которой применять (по умолчанию - последняя)")
+    migrate_parser.add_argument("--status", action="store_true", help="Показать примененные миграции")
+    migrate_parser.set_defaults(handler=migrate_command)
+
+    serve_parser = commands.add_parser("serve", help="Запустить API в нескольких процессах")
+    serve_parser.add_argument("--workers", type=int, default=settings.workers,
+                              help="Число процессов (0 - по числу ядер)")
+    serve_parser.add_argument("--host", default="0.0.0.0", help="Адрес")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Порт")
+    serve_parser.add_argument("--preload", action="store_true",
+                              help="Импортировать приложение до fork (только gunicorn)")
+    serve_parser.add_argument("--graceful-timeout", type=int, default=30,
+                              help="Сколько секунд ждать завершения запросов при остановке воркера")
+    serve_parser.add_argument("--max-requests", type=int, default=0,
+                              help="Перезапускать воркера после стольких запросов (0 - не перезапускать)")
+    serve_parser.set_defaults(handler=serve_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Метрики запросов и обращений к БД в формате Prometheus
+
+Включаются настройкой metrics_enabled. Тогда:
+- MetricsMiddleware замеряет время каждого HTTP-запроса по шаблону маршрута
+  (/films/{film_id}, а не /films/42) и добавляет заголовок Server-Timing:
+  db - время запросов к БД (и их число), app - все время обработки до ответа;
+- install_query_hooks() вешает на engine события SQLAlchemy, которые считают
+  запросы и их время (всего и в пределах текущего HTTP-запроса) и пишут
+  в лог filmoteka.sql запросы дольше slow_query_ms вместе с параметрами;
+- GET /metrics отдает счетчики, гистограммы и статистику кэшей.
+Когда метрики выключены, middleware и события не устанавливаются вовсе.
+
+Статистика текущего запроса хранится в contextvar; run_db копирует
+контекст в поток пула, поэтому запросы crud.py учитываются в своем HTTP-запросе.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache import cache_stats
+
+logger = logging.getLogger("filmoteka.sql")
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, label_values: tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in values.items():
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    """Гистограмма с метками (накопительные корзины, сумма и число наблюдений)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики корзин (последняя - +Inf), сумма]
+        self._values: dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, label_values: tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for label_values, (counts, total) in values.items():
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+http_requests = Counter(
+    "filmoteka_http_requests_total", "Число HTTP-запросов", ("method", "route", "status")
+)
+http_duration = Histogram(
+    "filmoteka_http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")
+)
+db_queries_per_request = Histogram(
+    "filmoteka_db_queries_per_request", "Число запросов к БД на HTTP-запрос", ("route",),
+    buckets=QUERIES_PER_REQUEST_BUCKETS
+)
+db_time_per_request = Histogram(
+    "filmoteka_db_time_per_request_seconds", "Время запросов к БД на HTTP-запрос", ("route",)
+)
+db_query_duration = Histogram(
+    "filmoteka_db_query_duration_seconds", "Время одного запроса к БД", ("statement",), buckets=QUERY_BUCKETS
+)
+db_slow_queries = Counter(
+    "filmoteka_db_slow_queries_total", "Число медленных запросов к БД", ("statement",)
+)
+
+METRICS = [http_requests, http_duration, db_queries_per_request, db_time_per_request, db_query_duration, db_slow_queries]
+
+
+class RequestStats:
+    """Запросы к БД в пределах одного HTTP-запроса"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("filmoteka_request_stats", default=None)
+
+
+def _statement_kind(statement: str) -> str:
+    """Тип SQL-команды для метки (SELECT, INSERT, ... или PRAGMA)"""
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "?"
+
+
+def install_query_hooks(engine, slow_query_ms: float) -> None:
+    """Считать запросы engine и логировать медленные (дольше slow_query_ms)"""
+    slow_seconds = slow_query_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("filmoteka_query_started", []).append((statement, time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["filmoteka_query_started"].pop()[1]
+        kind = _statement_kind(statement)
+        db_query_duration.observe(elapsed, (kind,))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed >= slow_seconds:
+            db_slow_queries.inc((kind,))
+            if executemany and parameters:
+                # Пакет может содержать тысячи наборов: в журнал попадает только первый
+                logger.warning("Медленный запрос (%.1f мс): %s; наборов параметров: %d, первый: %r",
+                               elapsed * 1000, statement, len(parameters), parameters[0])
+            else:
+                logger.warning("Медленный запрос (%.1f мс): %s; параметры: %r", elapsed * 1000, statement, parameters)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Для упавшего запроса after_cursor_execute не вызывается: снять его время старта,
+        # иначе следующие запросы соединения получат чужое время
+        if context.connection is None:
+            return
+        started = context.connection.info.get("filmoteka_query_started")
+        if started and started[-1][0] == context.statement:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время, число запросов к БД и Server-Timing для каждого HTTP-запроса"""
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes: dict = {}
+
+    def _route(self, scope: Scope) -> str:
+        """Шаблон пути маршрута, обработавшего запрос"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._routes.get(endpoint)
+        if path is None:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = self._routes[endpoint] = route.path
+                    break
+            else:
+                return "unmatched"
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    elapsed = time.perf_counter() - started
+                    headers = MutableHeaders(raw=message["headers"])
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                        f"app;dur={elapsed * 1000:.1f}"
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = self._route(scope)
+            method = scope["method"]
+            http_requests.inc((method, route, str(status)))
+            http_duration.observe(elapsed, (method, route))
+            db_queries_per_request.observe(stats.queries, (route,))
+            db_time_per_request.observe(stats.db_time, (route,))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: dict, value) -> str:
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_format_sample(*sample) for sample in metric.samples())
+
+    caches = cache_stats()
+    lines.append("# HELP filmoteka_films_generation Версия данных films в кэшах процесса")
+    lines.append("# TYPE filmoteka_films_generation gauge")
+    lines.append(f"filmoteka_films_generation {caches.pop('generation')}")
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        name = f"filmoteka_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, values in caches.items():
+            lines.append(_format_sample(name, {"cache": cache_name}, values.get(field, 0)))
+    return "\n".join(lines) + "\n"
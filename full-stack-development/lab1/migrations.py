@@ -0,0 +1,210 @@
+"""
+Версионные миграции схемы БД
+
+Каждая миграция - функция с номером версии; номера примененных миграций
+хранятся в таблице schema_migrations. Миграции применяет команда
+`python manage.py migrate` (или init_db в скриптах и бенчмарках),
+а приложение при старте только сверяет версию схемы (check_schema),
+поэтому запуск не зависит от размера БД.
+
+Миграции идемпотентны: БД, созданные до появления schema_migrations
+через create_all, проходят все шаги без ошибок.
+
+Новая миграция добавляется в конец MIGRATIONS со следующим номером.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, update
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+import search
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    """Схема БД не соответствует версии приложения"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Engine], None]
+
+
+def _create_tables(bind: Engine) -> None:
+    """Таблицы фильмов, статистики и счетчиков изменений"""
+    from database import Base
+    import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+    Base.metadata.create_all(bind=bind)
+
+
+def _add_genre_key(bind: Engine) -> None:
+    """Колонка films.genre_key с нормализованным жанром"""
+    from models import Film, normalize_genre
+
+    columns = {column["name"] for column in inspect(bind).get_columns("films")}
+    if "genre_key" in columns:
+        return
+    with bind.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE films ADD COLUMN genre_key VARCHAR")
+        # Нормализация в Python: lower() в SQLite не знает кириллицы.
+        # updated_at присваивается сам себе, чтобы не сработал onupdate
+        genres = conn.execute(select(Film.genre).distinct()).scalars().all()
+        for genre in genres:
+            conn.execute(
+                update(Film)
+                .where(Film.genre == genre)
+                .values(genre_key=normalize_genre(genre), updated_at=Film.updated_at)
+            )
+
+
+def _create_film_indexes(bind: Engine) -> None:
+    """
+    Индексы films из модели
+
+    Каждый индекс строится отдельной транзакцией, чтобы запись блокировалась
+    только на время построения одного индекса; в PostgreSQL - CONCURRENTLY,
+    без блокировки записи. Индексы по колонкам, которых еще нет, пропускаются:
+    их создает миграция, добавляющая колонку.
+    """
+    from models import Film
+
+    existing = {column["name"] for column in inspect(bind).get_columns("films")}
+    concurrently = bind.dialect.name == "postgresql"
+    for index in Film.__table__.indexes:
+        if any(column.name not in existing for column in index.columns):
+            continue
+        columns = ", ".join(column.name for column in index.columns)
+        unique = "UNIQUE " if index.unique else ""
+        statement = (
+            f"CREATE {unique}INDEX {'CONCURRENTLY ' if concurrently else ''}"
+            f"IF NOT EXISTS {index.name} ON films ({columns})"
+        )
+        if concurrently:
+            with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql(statement)
+        else:
+            with bind.begin() as conn:
+                conn.exec_driver_sql(statement)
+
+
+def _create_search_index(bind: Engine) -> None:
+    """Полнотекстовый индекс FTS5 и триггеры синхронизации (только SQLite)"""
+    search.create_search_index(bind)
+
+
+def _fill_stats(bind: Engine) -> None:
+    """Материализованная статистика и счетчик изменений films"""
+    from crud import ensure_change_counter
+    from stats import ensure_stats
+
+    with Session(bind=bind) as db:
+        ensure_stats(db)
+        ensure_change_counter(db)
+
+
+def _add_film_dimensions(bind: Engine) -> None:
+    """Справочники жанров и режиссеров, films.director_id и связи film_genres"""
+    from dimensions import rebuild_dimensions
+
+    _create_tables(bind)
+    columns = {column["name"] for column in inspect(bind).get_columns("films")}
+    if "director_id" not in columns:
+        with bind.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE films ADD COLUMN director_id INTEGER REFERENCES directors (id)")
+    _create_film_indexes(bind)
+    with Session(bind=bind) as db:
+        rebuild_dimensions(db)
+        db.commit()
+
+
+def _create_change_log(bind: Engine) -> None:
+    """Журнал изменений films для сброса кэшей в других процессах"""
+    _create_tables(bind)
+
+
+MIGRATIONS = [
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "films_genre_key", _add_genre_key),
+    Migration(3, "films_indexes", _create_film_indexes),
+    Migration(4, "films_search_index", _create_search_index),
+    Migration(5, "film_stats", _fill_stats),
+    Migration(6, "film_dimensions", _add_film_dimensions),
+    Migration(7, "film_change_log", _create_change_log),
+    Migration(8, "films_genre_sort_indexes", _create_film_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """Версия схемы БД (None, если миграции еще не применялись)"""
+    if not inspect(conn).has_table(schema_migrations.name):
+        return None
+    return conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc())).scalar()
+
+
+def migrate(bind: Engine, target: Optional[int] = None, on_step: Callable[[Migration], None] = None) -> list[int]:
+    """
+    Применить недостающие миграции до версии target (по умолчанию - последней)
+
+    Returns:
+        Номера примененных миграций
+    """
+    target = LATEST_VERSION if target is None else target
+    _metadata.create_all(bind=bind)
+    with bind.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version > target or migration.version in applied:
+            continue
+        if on_step is not None:
+            on_step(migration)
+        migration.upgrade(bind)
+        with bind.begin() as conn:
+            conn.execute(insert(schema_migrations).values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.now(timezone.utc)
+            ))
+        done.append(migration.version)
+    return done
+
+
+def check_schema(bind: Engine) -> int:
+    """
+    Быстрая проверка при старте: версия схемы совпадает с версией приложения
+
+    Raises:
+        SchemaVersionError: миграции не применены или БД новее приложения
+    """
+    with bind.connect() as conn:
+        version = current_version(conn)
+    if version is None or version < LATEST_VERSION:
+        raise SchemaVersionError(
+            f"Схема БД устарела (версия {version or 0}, нужна {LATEST_VERSION}): "
+            f"выполните python manage.py migrate"
+        )
+    if version > LATEST_VERSION:
+        raise SchemaVersionError(
+            f"Схема БД (версия {version}) новее приложения (версия {LATEST_VERSION})"
+        )
+    return version
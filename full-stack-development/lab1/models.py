@@ -1,11 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Index, ForeignKey, Table
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from database import Base
 
 
+def normalize_name(name: str) -> str:
+    """Ключ названия для сравнения на равенство: нижний регистр, ё -> е, одиночные пробелы"""
+    return " ".join(name.split()).lower().replace("ё", "е")
+
+
+def normalize_genre(genre: str) -> str:
+    """Ключ жанра (films.genre_key, genres.key)"""
+    return normalize_name(genre)
+
+
+def _genre_key_default(context) -> str:
+    # Для вставок через Core (пакетная загрузка), где validates не вызывается
+    return normalize_genre(context.get_current_parameters()["genre"])
+
+
 class Film(Base):
     """ORM модель для фильма"""
     __tablename__ = "films"
+    # Одиночные индексы дают порядок (колонка, id), нужный сортировке get_films
+    # без временного B-дерева. Составные - для точного жанра (genre_exact)
+    # с сортировкой или диапазоном по каждой колонке сортировки
+    __table_args__ = (
+        Index("ix_films_genre_key_rating", "genre_key", "rating"),
+        Index("ix_films_genre_key_year", "genre_key", "year"),
+        Index("ix_films_genre_key_title", "genre_key", "title"),
+        Index("ix_films_genre_key_created_at", "genre_key", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -13,7 +38,96 @@ class Film(Base):
     year = Column(Integer, nullable=False, index=True)
     rating = Column(Float, nullable=False, index=True)
     genre = Column(String, nullable=False)
+    # Нормализованный жанр (см. normalize_genre), заполняется автоматически
+    genre_key = Column(String, nullable=True, default=_genre_key_default, index=True)
+    # Режиссер из справочника directors (см. dimensions.py)
+    director_id = Column(Integer, ForeignKey("directors.id"), nullable=True, index=True)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    @validates("genre")
+    def _sync_genre_key(self, key, genre):
+        self.genre_key = normalize_genre(genre) if genre is not None else None
+        return genre
+
+
+class Genre(Base):
+    """Справочник жанров: один жанр на нормализованное написание"""
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    # Написание, под которым жанр впервые встретился
+    name = Column(String, nullable=False)
+    # normalize_genre(name), по нему жанры сопоставляются
+    key = Column(String, nullable=False, unique=True)
+
+
+class Director(Base):
+    """Справочник режиссеров"""
+    __tablename__ = "directors"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    # normalize_name(name)
+    key = Column(String, nullable=False, unique=True)
+
+
+# Жанры фильмов (многие ко многим): "Драма, Криминал" - два жанра
+film_genres = Table(
+    "film_genres",
+    Base.metadata,
+    Column("film_id", Integer, ForeignKey("films.id", ondelete="CASCADE"), primary_key=True),
+    Column("genre_id", Integer, ForeignKey("genres.id"), primary_key=True),
+    # Фильтр по жанру: film_id по genre_id без обращения к таблице
+    Index("ix_film_genres_genre_id_film_id", "genre_id", "film_id"),
+)
+
+
+class FilmStatsTotals(Base):
+    """Материализованные итоги по таблице films (одна строка, id = 1)"""
+    __tablename__ = "film_stats"
+
+    id = Column(Integer, primary_key=True)
+    total_films = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    min_rating = Column(Float, nullable=True)
+    max_rating = Column(Float, nullable=True)
+
+
+class FilmStatsByYear(Base):
+    """Материализованное число фильмов по годам"""
+    __tablename__ = "film_stats_by_year"
+
+    year = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class FilmStatsByGenre(Base):
+    """Материализованное число фильмов по жанрам"""
+    __tablename__ = "film_stats_by_genre"
+
+    genre = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ChangeCounter(Base):
+    """Счетчик изменений таблицы: растет на 1 при каждой записи (версия данных для ETag)"""
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class FilmChange(Base):
+    """
+    Журнал изменений films: запись на каждую версию change_counters,
+    по нему другие процессы сбрасывают свои кэши (см. invalidation.py)
+    """
+    __tablename__ = "film_changes"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    # JSON-список id измененных или удаленных фильмов; NULL - сбросить все карточки
+    film_ids = Column(Text)
+    changed_at = Column(DateTime(timezone=True))
@@ -0,0 +1,181 @@
+"""
+Встроенный статистический профилировщик
+
+Профилировщик не трогает код приложения: отдельный поток с заданным
+интервалом снимает стеки потоков (sys._current_frames) и считает, сколько
+раз встретился каждый стек. Результат - свернутые стеки (collapsed stacks):
+строка "модуль.функция;...;модуль.функция число_сэмплов" на стек, формат
+flamegraph.pl, speedscope и inferno. В стеках видны crud.get_films, загрузка
+строк SQLAlchemy, сериализация ответа и т.д.
+
+Режимы (оба требуют настройки admin_token и заголовка X-Admin-Token):
+- POST /admin/profile?seconds=N - сэмплировать все потоки процесса N секунд;
+- заголовок X-Profile: 1 у любого запроса - сэмплировать поток event loop
+  и потоки пула БД, пока выполняется этот запрос, и вернуть вместо ответа
+  свернутые стеки (параллельные запросы в тех же потоках тоже попадут в сэмплы).
+
+Пока профилирование не запущено, накладных расходов нет; одновременно
+работает не больше одного сеанса, длительность ограничена profiler_max_seconds.
+Сэмплы простаивающих потоков (ожидание задачи пула, select event loop)
+отбрасываются, поэтому профиль показывает, на что уходит работа.
+"""
+import hmac
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+
+# Потоки пула БД (см. database.db_executor)
+DB_THREAD_PREFIX = "filmoteka-db"
+
+# Функции, в которых поток простаивает (ждет задачу или событие): такие сэмплы не учитываются
+IDLE_FRAMES = {
+    "concurrent.futures.thread._worker",
+    "threading.wait",
+    "queue.get",
+    "selectors.select",
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Уже идет другой сеанс профилирования"""
+
+
+_session_lock = threading.Lock()
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """Токен администратора совпадает с настройкой admin_token (без нее - всегда нет)"""
+    if not settings.admin_token or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), settings.admin_token.encode())
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{frame.f_code.co_name}"
+
+
+def _collapse(frame) -> Optional[str]:
+    """Стек от корня к frame через ";" (None, если поток простаивает)"""
+    if _frame_name(frame) in IDLE_FRAMES:
+        return None
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """
+    Сеанс сэмплирования стеков
+
+    Args:
+        interval: Интервал между сэмплами, секунды
+        threads: Функция, возвращающая id сэмплируемых потоков (None - все, кроме самого сэмплера)
+    """
+
+    def __init__(self, interval: float, threads: Optional[Callable[[], set]] = None):
+        self.interval = interval
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="filmoteka-profiler", daemon=True)
+
+    def __enter__(self) -> "Sampler":
+        if not _session_lock.acquire(blocking=False):
+            raise ProfilerBusy("Профилирование уже запущено")
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        _session_lock.release()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            wanted = self.threads() if self.threads is not None else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (wanted is not None and thread_id not in wanted):
+                    continue
+                stack = _collapse(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Свернутые стеки, самые частые первыми"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def sample_for(seconds: float, interval: float) -> Sampler:
+    """Сэмплировать все потоки процесса seconds секунд (блокирует вызывающий поток)"""
+    seconds = min(seconds, settings.profiler_max_seconds)
+    with Sampler(interval) as sampler:
+        time.sleep(seconds)
+    return sampler
+
+
+def _request_threads(loop_thread: int) -> Callable[[], set]:
+    def threads() -> set:
+        ids = {loop_thread}
+        ids.update(thread.ident for thread in threading.enumerate() if thread.name.startswith(DB_THREAD_PREFIX))
+        return ids
+    return threads
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware профилирования одного запроса по заголовку X-Profile
+
+    Без заголовка запрос проходит без изменений (проверяется только заголовок).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if "x-profile" not in headers:
+            await self.app(scope, receive, send)
+            return
+        if not check_admin_token(headers.get("x-admin-token")):
+            await JSONResponse({"detail": "Нужен X-Admin-Token"}, status_code=403)(scope, receive, send)
+            return
+
+        status = 500
+
+        async def discard(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        interval = settings.profiler_interval_ms / 1000
+        started = time.perf_counter()
+        try:
+            with Sampler(interval, _request_threads(threading.get_ident())) as sampler:
+                await self.app(scope, receive, discard)
+        except ProfilerBusy as e:
+            await JSONResponse({"detail": str(e)}, status_code=409)(scope, receive, send)
+            return
+        elapsed = time.perf_counter() - started
+        response = PlainTextResponse(sampler.collapsed(), headers={
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Status": str(status),
+            "X-Profile-Duration-Ms": f"{elapsed * 1000:.1f}",
+        })
+        await response(scope, receive, send)
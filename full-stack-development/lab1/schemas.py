@@ -2,6 +2,12 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional
 from datetime import datetime
 
+# Максимум id в одном запросе POST /films/batch-get
+BATCH_GET_MAX_IDS = 100
+
+# Максимум id в одном запросе PATCH/DELETE /films/bulk
+BULK_CHANGE_MAX_IDS = 10000
+
 
 class FilmBase(BaseModel):
     """Базовая схема фильма"""
@@ -57,10 +63,47 @@ class FilmResponse(FilmBase):
 class FilmListResponse(BaseModel):
     """Схема для списка фильмов с пагинацией"""
     items: list[FilmResponse]
-    total: int
+    total: Optional[int] = None  # None, если запрошено include_total=false
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+
+
+class FilmCursorListResponse(BaseModel):
+    """Схема для списка фильмов с keyset-пагинацией (по курсору)"""
+    items: list[FilmResponse]
+    size: int
+    next_cursor: Optional[str] = None
+
+
+class FilmBatchGetRequest(BaseModel):
+    """Запрос нескольких фильмов по id"""
+    ids: list[int] = Field(..., min_length=1, max_length=BATCH_GET_MAX_IDS)
+
+
+class FilmBatchGetResponse(BaseModel):
+    """Найденные фильмы в порядке запроса и id ненайденных"""
+    items: list[FilmResponse]
+    missing: list[int]
+
+
+class FilmBulkError(BaseModel):
+    """Ошибка одной записи пакетной загрузки"""
+    index: int = Field(..., description="Номер записи во входных данных (с 0)")
+    error: str
+
+
+class FilmBulkResponse(BaseModel):
+    """Итог пакетной загрузки фильмов"""
+    received: int
+    inserted: int
+    failed: int
+    errors: list[FilmBulkError]
+
+
+class FilmBulkChangeResponse(BaseModel):
+    """Итог пакетного изменения или удаления фильмов"""
+    affected: int = Field(..., description="Число измененных (удаленных) фильмов")
 
 
 class FilmStatsResponse(BaseModel):
@@ -72,3 +115,31 @@ class FilmStatsResponse(BaseModel):
     films_by_year: dict
     films_by_genre: dict
 
+
+
+class GenreFacet(BaseModel):
+    """Число фильмов жанра"""
+    id: int
+    name: str
+    count: int
+
+
+class DecadeFacet(BaseModel):
+    """Число фильмов десятилетия"""
+    decade: int = Field(..., description="Первый год десятилетия (1990 - 1990-1999)")
+    count: int
+
+
+class RatingFacet(BaseModel):
+    """Число фильмов с рейтингом в [min, max) (последний интервал включает 10)"""
+    min: int
+    max: int
+    count: int
+
+
+class FilmFacetsResponse(BaseModel):
+    """Фасеты списка фильмов для текущих фильтров"""
+    total: int
+    genres: list[GenreFacet]
+    decades: list[DecadeFacet]
+    ratings: list[RatingFacet]
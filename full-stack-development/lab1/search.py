@@ -0,0 +1,139 @@
+"""
+Полнотекстовый поиск фильмов на SQLite FTS5
+
+Индекс films_fts покрывает название, режиссера и описание. Он contentless
+(хранит только токены) и поддерживается триггерами на таблице films,
+поэтому синхронизирован при любой записи - через ORM или пакетные вставки.
+
+Регистр сворачивает токенизатор unicode61 (включая кириллицу),
+а "ё" приводится к "е" и при индексации, и в запросе.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import Table, Column, Integer, String, MetaData, func, literal_column, select, text
+
+FTS_TABLE = "films_fts"
+
+# Описание FTS-таблицы для построения запросов; отдельная MetaData, чтобы
+# create_all не пытался создать ее как обычную таблицу
+films_fts = Table(
+    FTS_TABLE,
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("title", String),
+    Column("director", String),
+    Column("description", String),
+)
+
+# Веса колонок для ранжирования bm25: название важнее режиссера и описания
+TITLE_WEIGHT = 10.0
+DIRECTOR_WEIGHT = 4.0
+DESCRIPTION_WEIGHT = 1.0
+
+_COLUMNS = ("title", "director", "description")
+
+
+def _fold_yo(expr: str) -> str:
+    """SQL-выражение, заменяющее ё на е"""
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _values(prefix: str) -> str:
+    return ", ".join(_fold_yo(f"{prefix}.{column}") for column in _COLUMNS)
+
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, director, description,
+        content='',
+        tokenize='unicode61 remove_diacritics 0',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS films_fts_insert AFTER INSERT ON films BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, director, description)
+        VALUES (new.id, {_values("new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS films_fts_delete AFTER DELETE ON films BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, director, description)
+        VALUES ('delete', old.id, {_values("old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS films_fts_update AFTER UPDATE OF title, director, description ON films BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, director, description)
+        VALUES ('delete', old.id, {_values("old")});
+        INSERT INTO {FTS_TABLE}(rowid, title, director, description)
+        VALUES (new.id, {_values("new")});
+    END
+    """,
+]
+
+
+def create_search_index(bind) -> None:
+    """Создать FTS-индекс и триггеры (если их нет) и проиндексировать существующие фильмы"""
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        for statement in _DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, title, director, description) "
+                f"SELECT id, {_values('films')} FROM films"
+            ))
+
+
+def is_supported(db) -> bool:
+    """Доступен ли FTS-индекс для БД сессии"""
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def normalize(value: str) -> str:
+    """Привести строку к виду, в котором она хранится в индексе"""
+    return value.replace("ё", "е").replace("Ё", "Е")
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Построить выражение MATCH из пользовательского запроса
+
+    Каждое слово ищется как префикс (поиск по мере ввода), все слова
+    должны встретиться. Спецсимволы синтаксиса FTS5 отбрасываются.
+    Возвращает None, если в запросе нет ни одного слова.
+    """
+    tokens = re.findall(r"[^\W_]+", normalize(query))
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def hits_query(match_query: str):
+    """
+    Запрос найденных фильмов: film_id и релевантность relevance (bm25, меньше - лучше)
+
+    bm25 можно вызывать только в запросе непосредственно к FTS-таблице, поэтому
+    сортировка и LIMIT применяются здесь, а films присоединяется уже к странице
+    результатов - иначе пришлось бы читать строки films для всех совпадений.
+    """
+    rank = func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, DIRECTOR_WEIGHT, DESCRIPTION_WEIGHT)
+    return select(
+        films_fts.c.rowid.label("film_id"),
+        rank.label("relevance")
+    ).where(literal_column(FTS_TABLE).op("MATCH")(match_query))
+
+
+def count_query(match_query: str):
+    """Запрос числа совпадений (без вычисления релевантности)"""
+    return select(func.count()).select_from(films_fts).where(
+        literal_column(FTS_TABLE).op("MATCH")(match_query)
+    )
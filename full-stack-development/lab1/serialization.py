@@ -0,0 +1,111 @@
+"""
+Быстрая сериализация ответов со списками фильмов
+
+Списки фильмов читаются из БД кортежами колонок FILM_FIELDS (без ORM-объектов)
+и отдаются FastJSONResponse в обход response_model: данные из собственной БД
+уже прошли валидацию при записи, поэтому повторная проверка FilmResponse
+(from_attributes и валидаторы FilmBase) для каждой строки не нужна.
+JSON кодируется orjson, если он установлен, иначе - стандартным json;
+результат совпадает с FilmResponse.model_dump_json().
+
+Параметр fields (например, fields=id,title,year,rating) ограничивает
+поля фильмов в ответе; в списках проекция выполняется в SELECT.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+
+from schemas import FilmResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson указан в requirements.txt
+    orjson = None
+
+# Поля фильма в ответе в порядке FilmResponse
+FILM_FIELDS = tuple(FilmResponse.model_fields)
+
+
+def parse_fields(value: Optional[str]) -> Optional[tuple[str, ...]]:
+    """
+    Разобрать параметр fields ("id,title,year") в поля FILM_FIELDS
+
+    Returns:
+        Поля в порядке FILM_FIELDS или None (все поля), если параметр не передан
+
+    Raises:
+        ValueError: неизвестное поле или пустой список
+    """
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    if not names:
+        raise ValueError("Параметр fields не содержит ни одного поля")
+    unknown = names.difference(FILM_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))}; доступны: {', '.join(FILM_FIELDS)}"
+        )
+    return tuple(name for name in FILM_FIELDS if name in names)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Объект типа {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в bytes (UTF-8, без пробелов)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def film_item(row, fields: Optional[tuple[str, ...]] = None) -> dict:
+    """
+    Фильм из строки колонок в виде словаря FilmResponse
+
+    Args:
+        row: Строка колонок FILM_FIELDS; колонки после них (например, total
+             или релевантность) отбрасываются
+        fields: Только эти поля (строка выбрана с колонками по именам,
+                см. crud.film_columns)
+    """
+    if fields is None:
+        return dict(zip(FILM_FIELDS, row))
+    return {name: getattr(row, name) for name in fields}
+
+
+def project(item: dict, fields: Optional[tuple[str, ...]]) -> dict:
+    """Оставить в словаре фильма только поля fields"""
+    if fields is None:
+        return item
+    return {name: item[name] for name in fields}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, кодируемый dumps() (orjson) без jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def film_list_response(
+    rows: Iterable,
+    headers: dict = None,
+    fields: Optional[tuple[str, ...]] = None,
+    **meta
+) -> FastJSONResponse:
+    """
+    Ответ со списком фильмов: {"items": [...], **meta}
+
+    Args:
+        rows: Строки колонок фильмов (см. film_item)
+        headers: Заголовки ответа (валидаторы ETag/Last-Modified)
+        fields: Поля фильмов в ответе (None - все)
+        meta: Остальные поля FilmListResponse / FilmCursorListResponse
+    """
+    return FastJSONResponse({"items": [film_item(row, fields) for row in rows], **meta}, headers=headers)
@@ -0,0 +1,249 @@
+"""
+Инкрементально поддерживаемая статистика фильмотеки
+
+Итоги (количество, сумма рейтингов, минимум и максимум) и счетчики
+по годам и жанрам хранятся в таблицах film_stats*, которые обновляются
+в той же транзакции, что и запись в films (см. crud.py). Поэтому
+/films/stats/overview читает несколько маленьких таблиц вместо
+агрегирования всей таблицы films.
+
+Минимум и максимум при добавлении обновляются сравнением, а при удалении
+текущего экстремума пересчитываются запросом MIN/MAX по индексу rating.
+"""
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import func, update, delete, insert, case, select
+from sqlalchemy.orm import Session
+
+from models import Film, FilmStatsTotals, FilmStatsByYear, FilmStatsByGenre
+
+TOTALS_ID = 1
+
+# Допустимое расхождение среднего рейтинга из-за накопления ошибок float
+AVERAGE_TOLERANCE = 0.005
+
+
+def film_key(film) -> tuple[int, float, str]:
+    """Поля фильма, от которых зависит статистика"""
+    return film.year, film.rating, film.genre
+
+
+def _empty_stats() -> dict:
+    return {
+        "total_films": 0,
+        "average_rating": 0.0,
+        "min_rating": 0.0,
+        "max_rating": 0.0,
+        "films_by_year": {},
+        "films_by_genre": {}
+    }
+
+
+def _bump_counters(db: Session, model, key_column, deltas: Counter) -> None:
+    """Изменить счетчики групп; строки создаются и удаляются по необходимости"""
+    for key, delta in deltas.items():
+        if delta == 0:
+            continue
+        result = db.execute(
+            update(model).where(key_column == key).values(count=model.count + delta)
+        )
+        if result.rowcount == 0 and delta > 0:
+            db.execute(insert(model).values({key_column.key: key, "count": delta}))
+        elif delta < 0:
+            db.execute(delete(model).where(key_column == key, model.count <= 0))
+
+
+def _recompute_extremes(db: Session) -> None:
+    """Пересчитать минимум и максимум рейтинга по таблице films"""
+    min_rating, max_rating = db.execute(select(func.min(Film.rating), func.max(Film.rating))).one()
+    db.execute(
+        update(FilmStatsTotals)
+        .where(FilmStatsTotals.id == TOTALS_ID)
+        .values(min_rating=min_rating, max_rating=max_rating)
+    )
+
+
+def apply_delta(
+    db: Session,
+    added: Iterable[tuple[int, float, str]] = (),
+    removed: Iterable[tuple[int, float, str]] = ()
+) -> None:
+    """
+    Учесть в статистике добавленные и удаленные фильмы
+
+    Вызывается внутри транзакции записи после flush() изменений films,
+    коммит остается за вызывающим. Обновление фильма передается как
+    удаление старых значений и добавление новых.
+
+    Args:
+        added: (year, rating, genre) добавленных фильмов
+        removed: (year, rating, genre) удаленных фильмов
+    """
+    added = list(added)
+    removed = list(removed)
+    if not added and not removed:
+        return
+
+    by_year = Counter()
+    by_genre = Counter()
+    for year, _, genre in added:
+        by_year[year] += 1
+        by_genre[genre] += 1
+    for year, _, genre in removed:
+        by_year[year] -= 1
+        by_genre[genre] -= 1
+
+    rating_delta = sum(rating for _, rating, _ in added) - sum(rating for _, rating, _ in removed)
+    db.execute(
+        update(FilmStatsTotals)
+        .where(FilmStatsTotals.id == TOTALS_ID)
+        .values(
+            total_films=FilmStatsTotals.total_films + len(added) - len(removed),
+            rating_sum=FilmStatsTotals.rating_sum + rating_delta
+        )
+    )
+    _bump_counters(db, FilmStatsByYear, FilmStatsByYear.year, by_year)
+    _bump_counters(db, FilmStatsByGenre, FilmStatsByGenre.genre, by_genre)
+
+    if removed:
+        current = db.get(FilmStatsTotals, TOTALS_ID, populate_existing=True)
+        removed_ratings = [rating for _, rating, _ in removed]
+        if (current.min_rating is not None and min(removed_ratings) <= current.min_rating) or \
+                (current.max_rating is not None and max(removed_ratings) >= current.max_rating):
+            # Удален текущий экстремум - films уже содержит итоговое состояние,
+            # поэтому пересчет учитывает и добавленные фильмы
+            _recompute_extremes(db)
+            return
+
+    if added:
+        new_min = min(rating for _, rating, _ in added)
+        new_max = max(rating for _, rating, _ in added)
+        db.execute(
+            update(FilmStatsTotals)
+            .where(FilmStatsTotals.id == TOTALS_ID)
+            .values(
+                min_rating=case(
+                    (FilmStatsTotals.min_rating.is_(None), new_min),
+                    (FilmStatsTotals.min_rating > new_min, new_min),
+                    else_=FilmStatsTotals.min_rating
+                ),
+                max_rating=case(
+                    (FilmStatsTotals.max_rating.is_(None), new_max),
+                    (FilmStatsTotals.max_rating < new_max, new_max),
+                    else_=FilmStatsTotals.max_rating
+                )
+            )
+        )
+
+
+def read_stats(db: Session) -> dict:
+    """Прочитать статистику из материализованных таблиц"""
+    totals: Optional[FilmStatsTotals] = db.get(FilmStatsTotals, TOTALS_ID)
+    if totals is None or totals.total_films <= 0:
+        return _empty_stats()
+
+    films_by_year = db.execute(
+        select(FilmStatsByYear.year, FilmStatsByYear.count).order_by(FilmStatsByYear.year)
+    ).all()
+    films_by_genre = db.execute(
+        select(FilmStatsByGenre.genre, FilmStatsByGenre.count).order_by(FilmStatsByGenre.genre)
+    ).all()
+
+    return {
+        "total_films": totals.total_films,
+        "average_rating": round(totals.rating_sum / totals.total_films, 2),
+        "min_rating": totals.min_rating or 0.0,
+        "max_rating": totals.max_rating or 0.0,
+        "films_by_year": {str(year): count for year, count in films_by_year},
+        "films_by_genre": {genre: count for genre, count in films_by_genre}
+    }
+
+
+def compute_stats(db: Session) -> dict:
+    """Посчитать статистику агрегирующими запросами по всей таблице films"""
+    total_films = db.query(func.count(Film.id)).scalar()
+
+    if total_films == 0:
+        return _empty_stats()
+
+    stats = db.query(
+        func.avg(Film.rating).label('avg_rating'),
+        func.min(Film.rating).label('min_rating'),
+        func.max(Film.rating).label('max_rating')
+    ).first()
+
+    # Статистика по годам
+    films_by_year = db.query(
+        Film.year,
+        func.count(Film.id).label('count')
+    ).group_by(Film.year).all()
+
+    # Статистика по жанрам
+    films_by_genre = db.query(
+        Film.genre,
+        func.count(Film.id).label('count')
+    ).group_by(Film.genre).all()
+
+    return {
+        "total_films": total_films,
+        "average_rating": round(stats.avg_rating or 0.0, 2),
+        "min_rating": stats.min_rating or 0.0,
+        "max_rating": stats.max_rating or 0.0,
+        "films_by_year": {str(year): count for year, count in films_by_year},
+        "films_by_genre": {genre: count for genre, count in films_by_genre}
+    }
+
+
+def rebuild_stats(db: Session) -> None:
+    """Пересчитать материализованную статистику с нуля (коммит за вызывающим)"""
+    db.execute(delete(FilmStatsByYear))
+    db.execute(delete(FilmStatsByGenre))
+    db.execute(delete(FilmStatsTotals))
+
+    total_films, rating_sum, min_rating, max_rating = db.execute(
+        select(func.count(Film.id), func.coalesce(func.sum(Film.rating), 0.0),
+               func.min(Film.rating), func.max(Film.rating))
+    ).one()
+    db.execute(insert(FilmStatsTotals).values(
+        id=TOTALS_ID,
+        total_films=total_films,
+        rating_sum=rating_sum,
+        min_rating=min_rating,
+        max_rating=max_rating
+    ))
+    db.execute(insert(FilmStatsByYear).from_select(
+        ["year", "count"],
+        select(Film.year, func.count(Film.id)).group_by(Film.year)
+    ))
+    db.execute(insert(FilmStatsByGenre).from_select(
+        ["genre", "count"],
+        select(Film.genre, func.count(Film.id)).group_by(Film.genre)
+    ))
+
+
+def ensure_stats(db: Session) -> None:
+    """Заполнить статистику, если ее еще нет (новая или старая БД)"""
+    if db.get(FilmStatsTotals, TOTALS_ID) is None:
+        rebuild_stats(db)
+        db.commit()
+
+
+def check_stats(db: Session) -> dict:
+    """
+    Сравнить материализованную статистику с пересчитанной с нуля
+
+    Returns:
+        Словарь расхождений {поле: (материализованное, пересчитанное)}, пустой если все сходится
+    """
+    stored = read_stats(db)
+    actual = compute_stats(db)
+    diff = {}
+    for field, actual_value in actual.items():
+        stored_value = stored[field]
+        if field == "average_rating":
+            if abs(stored_value - actual_value) > AVERAGE_TOLERANCE:
+                diff[field] = (stored_value, actual_value)
+        elif stored_value != actual_value:
+            diff[field] = (stored_value, actual_value)
+    return diff
@@ -30,6 +30,9 @@ if not exist filmoteka.db (
     python init_test_data.py
 )
 
+:: Миграции схемы БД (сервер при старте только проверяет версию схемы)
+python manage.py migrate
+
 :: Запуск Backend в фоновом режиме с логами
 echo Backend запущен на http://localhost:8000
 start "Backend" cmd /c "uvicorn main:app --reload --host 0.0.0.0 --port 8000 > ..\backend.log 2>&1"
@@ -26,6 +26,9 @@ if [ ! -f "filmoteka.db" ]; then
     python init_test_data.py
 fi
 
+# Миграции схемы БД (сервер при старте только проверяет версию схемы)
+python manage.py migrate
+
 # Запуск Backend
 echo "Backend запущен на http://localhost:8000"
 uvicorn main:app --reload --host 0.0.0.0 --port 8000 > ../backend.log 2>&1 &
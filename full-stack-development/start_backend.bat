@@ -40,6 +40,14 @@ if not exist filmoteka.db (
     )
 )
 
+:: Миграции схемы БД (сервер при старте только проверяет версию схемы)
+echo Применяю миграции схемы БД...
+python manage.py migrate
+if %errorlevel% neq 0 (
+    echo Ошибка при выполнении миграций
+    exit /b 1
+)
+
 :: Запуск uvicorn
 echo.
 echo Backend запущен на http://localhost:8000
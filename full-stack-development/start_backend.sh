@@ -20,6 +20,9 @@ if [ ! -f "filmoteka.db" ]; then
     python init_test_data.py
 fi
 
+# Миграции схемы БД (сервер при старте только проверяет версию схемы)
+python manage.py migrate
+
 # Запуск
 echo "Backend запущен на http://localhost:8000"
 uvicorn main:app --reload